@@ -1,5 +1,7 @@
 # api/analytics.py
 
+import json
+
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 from collections import Counter, defaultdict
@@ -82,7 +84,8 @@ def get_sessions(
             "filters_applied": row.filters_applied,
             "duration": row.duration,
             "style_prompt": row.style_prompt,
-            "timestamp": row.timestamp.isoformat()
+            "timestamp": row.timestamp.isoformat(),
+            "features": json.loads(row.features) if row.features else None
         }
         for row in results
     ]
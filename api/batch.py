@@ -0,0 +1,248 @@
+# api/batch.py
+
+import asyncio
+import json
+import os
+import shutil
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import soundfile as sf
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
+
+from audio_engine.analysis import AnalysisContext
+from audio_engine.pipeline import describe_chain
+from audio_engine.presets import resolve_chain, get_processor
+from audio_engine.resample import load_audio
+from config import WORKING_SR
+from database.session_logger import log_transformations
+from models.feature_extraction import extract_features
+from services.memory_budget import BUDGET, estimate_bytes, probe
+from services.file_handler import save_upload_file
+
+router = APIRouter()
+
+BATCH_DIR = Path("data/batch")
+AUDIO_EXTS = {".wav", ".mp3", ".flac", ".ogg", ".m4a", ".aac", ".webm"}
+MAX_GROUP = 8           # clips stacked into one array
+MAX_LEN_RATIO = 1.25    # longest / shortest clip allowed in one group
+# Zip uploads are checked against their declared sizes before anything is
+# extracted (ZipExtFile never reads past the declared size)
+MAX_ARCHIVE_MEMBERS = 500
+MAX_MEMBER_BYTES = 200 * 1024 * 1024
+MAX_ARCHIVE_BYTES = 1024 * 1024 * 1024
+
+_executor = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+    return _executor
+
+
+# ── Helpers ────────────────────────────────────────────────────────────────
+def _expand_archive(path: str, target_dir: Path) -> List[str]:
+    """
+    Extract audio members of a zip upload, ignoring everything else.
+    Raises ValueError for archives over the member / size limits.
+    """
+    paths = []
+    try:
+        with zipfile.ZipFile(path) as zf:
+            members = [m for m in zf.infolist()
+                       if not m.is_dir() and Path(m.filename).suffix.lower() in AUDIO_EXTS]
+            if len(members) > MAX_ARCHIVE_MEMBERS:
+                raise ValueError(f"Archive has {len(members)} audio files (limit {MAX_ARCHIVE_MEMBERS})")
+            too_big = [m.filename for m in members if m.file_size > MAX_MEMBER_BYTES]
+            if too_big:
+                raise ValueError(f"'{too_big[0]}' is larger than {MAX_MEMBER_BYTES // 2**20} MB uncompressed")
+            if sum(m.file_size for m in members) > MAX_ARCHIVE_BYTES:
+                raise ValueError(f"Archive is larger than {MAX_ARCHIVE_BYTES // 2**20} MB uncompressed")
+
+            for member in members:
+                name = Path(member.filename).name
+                out = target_dir / f"{Path(name).stem}_{uuid.uuid4().hex[:8]}{Path(name).suffix}"
+                with zf.open(member) as src, open(out, "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                paths.append(str(out))
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Invalid zip archive: {e}")
+    finally:
+        os.remove(path)
+    return paths
+
+
+def _duration(path: str) -> float:
+    try:
+        return sf.info(path).duration
+    except Exception:
+        return 0.0  # unknown container – gets a group of its own at the front
+
+
+def group_by_length(paths: List[str]) -> List[List[str]]:
+    """Bucket clips of similar length so each bucket can be stacked with little padding."""
+    durations = {p: _duration(p) for p in paths}
+    groups, current, shortest = [], [], 0.0
+    for p in sorted(paths, key=durations.get):
+        d = durations[p]
+        if current and (len(current) >= MAX_GROUP or shortest <= 0 or d / shortest > MAX_LEN_RATIO):
+            groups.append(current)
+            current = []
+        if not current:
+            shortest = d
+        current.append(p)
+    if current:
+        groups.append(current)
+    return groups
+
+
+def process_group(paths: List[str], chain: list, out_dir: str) -> List[dict]:
+    """
+    Worker entry point (runs in a child process).
+    Loads a group at the working rate, zero-pads it into one (clips, n) array,
+    runs the chain once and trims every clip back to its own length.
+    """
+    clips = [load_audio(p, sr=WORKING_SR)[0] for p in paths]
+    lengths = [len(c) for c in clips]
+    stack = np.zeros((len(clips), max(lengths)), dtype=np.float32)
+    for row, clip in zip(stack, clips):
+        row[:len(clip)] = clip
+
+    ctx = AnalysisContext(stack, WORKING_SR)
+    ctx.lengths = lengths
+    ctx.features = features = extract_features(ctx, lengths)
+    out = get_processor(chain, WORKING_SR).run(ctx).y
+    scale = out.shape[-1] / stack.shape[-1]
+
+    results = []
+    for path, n, y, feats in zip(paths, lengths, out, features):
+        y = y[:int(round(n * scale))]
+        out_path = os.path.join(out_dir, f"{Path(path).stem}_processed.wav")
+        sf.write(out_path, y, WORKING_SR)
+        results.append({
+            "source": Path(path).name,
+            "output": Path(out_path).name,
+            "duration": len(y) / WORKING_SR,
+            "features": feats,
+        })
+    return results
+
+
+# ── Routes ─────────────────────────────────────────────────────────────────
+@router.post("/transform/batch")
+async def batch_transform(
+    files: List[UploadFile] = File(...),
+    pitch_shift: int = Form(0),
+    time_stretch: float = Form(1.0),
+    clarity: bool = Form(False),
+    denoise: bool = Form(False),
+    autotune: bool = Form(False),
+    preset: str = Form(""),
+    effect: str = Form(""),
+    archive: bool = Form(False),
+):
+    """
+    Apply one parameter set to many clips (or a .zip of clips) across all cores.
+    Streams one NDJSON line per file as groups finish, or a single zip when archive=true.
+    """
+    try:
+        chain = resolve_chain(preset, pitch_shift=pitch_shift, time_stretch=time_stretch,
+                              clarity=clarity, denoise=denoise, autotune=autotune, effect=effect)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    batch_id = uuid.uuid4().hex[:12]
+    raw_dir = BATCH_DIR / batch_id / "raw"
+    out_dir = BATCH_DIR / batch_id / "processed"
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    paths = []
+    for f in files:
+        saved = await save_upload_file(f, str(raw_dir))
+        if saved.lower().endswith(".zip"):
+            try:
+                paths.extend(_expand_archive(saved, raw_dir))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        else:
+            paths.append(saved)
+    if not paths:
+        raise HTTPException(status_code=400, detail="No audio files in upload")
+
+    filters = describe_chain(pitch_shift, time_stretch, clarity, denoise, effect=effect)
+    if preset:
+        filters.insert(0, f"preset:{preset}")
+    groups = group_by_length(paths)
+    print(f"[Batch {batch_id}] {len(paths)} files in {len(groups)} groups")
+
+    loop = asyncio.get_running_loop()
+    pool = _get_executor()
+    stages = ["features"] + [name for name, _ in chain]
+
+    async def run_group(group):
+        # A group is stacked into one array, so it is admitted as a whole:
+        # the longest clip times the group size, at the highest source rate
+        try:
+            probes = [probe(p) for p in group]
+            estimated = estimate_bytes(max(d for d, _ in probes), max(r for _, r in probes),
+                                       stages, clips=len(group))
+            async with BUDGET.reserve(estimated):
+                return await loop.run_in_executor(pool, process_group, group, chain, str(out_dir))
+        except Exception as e:
+            # Budget refusals and worker failures only fail this group
+            return [{"source": Path(p).name, "error": str(e) or type(e).__name__} for p in group]
+
+    futures = [asyncio.ensure_future(run_group(g)) for g in groups]
+
+    def _log(results):
+        log_transformations([
+            {"file_name": r["source"], "filters_used": filters, "duration": r["duration"],
+             "features": r.get("features")}
+            for r in results if "error" not in r
+        ])
+
+    if archive:
+        results = []
+        for fut in asyncio.as_completed(futures):
+            results.extend(await fut)
+        _log(results)
+        zip_path = BATCH_DIR / batch_id / "processed.zip"
+        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+            for r in results:
+                if "output" in r:
+                    zf.write(out_dir / r["output"], r["output"])
+            # Every input, including the ones that failed and why
+            zf.writestr("manifest.json", json.dumps({"batch_id": batch_id, "results": results}, indent=2))
+        return FileResponse(zip_path, media_type="application/zip", filename="processed.zip")
+
+    async def stream():
+        results = []
+        for fut in asyncio.as_completed(futures):
+            try:
+                done = await fut
+            except Exception as e:
+                # as_completed order is unknown, so failed groups are reported without names
+                done = [{"error": str(e)}]
+            for r in done:
+                if "output" in r:
+                    r["url"] = f"/api/transform/batch/{batch_id}/{r['output']}"
+                results.append(r)
+                yield json.dumps({"batch_id": batch_id, **r}) + "\n"
+        _log(results)
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@router.get("/transform/batch/{batch_id}/{name}")
+def get_batch_output(batch_id: str, name: str):
+    path = BATCH_DIR / Path(batch_id).name / "processed" / Path(name).name
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Not found")
+    return FileResponse(path, media_type="audio/wav", filename=path.name)
@@ -1,64 +1,203 @@
 # Location: backend/api/live_audio_ws.py
 
-import io
+import asyncio
+import time
+from typing import Optional
 import numpy as np
-import soundfile as sf
 from fastapi import APIRouter, WebSocket, Query
 from starlette.websockets import WebSocketState
 
-# ── Chunk‑level helpers (add these tiny functions in your effects modules) ──
-from audio_engine.effects.basic import pitch_speed_chunk       # new
-from audio_engine.effects.clarity import clarity_boost_chunk   # new
-from audio_engine.effects.denoise import remove_noise_chunk     # new
+# ── Compiled effect chains are shared with the file and batch paths ──
+from audio_engine.presets import resolve_chain, get_processor
+from audio_engine.resample import StreamingResampler
+from audio_engine.codecs import StreamDecoder, StreamEncoder
+from audio_engine.vad import StreamingVAD, HANGOVER_MS, SILENCE_GAIN
+from api.live_protocol import (
+    ACTIVE_SESSIONS, DEFAULT_LATENCY_MS, ConnectionStats, Frame, JitterBuffer,
+    pack_frame, parse_frame,
+)
+from config import (
+    WORKING_SR, LIVE_VAD_ENABLED, CHUNK, RATE, MIN_CHUNK, MAX_CHUNK, LIVE_RATES, REALTIME_HEADROOM,
+)
 
 router = APIRouter()
 
-TARGET_SR   = 16_000        # 16‑kHz mono
-FRAME_SIZE  = 2048          # must match ScriptProcessorNode in JS
+MIN_CLIENT_SR = 8000
+MAX_CLIENT_SR = 192000
+STATS_INTERVAL_S = 6.4      # seconds of audio between stats messages, whatever the frame size
 
-# ── Utility converters ─────────────────────────────────────────────────────
-def int16_to_float32(buf: bytes) -> np.ndarray:
-    audio_i16 = np.frombuffer(buf, dtype=np.int16)
-    return (audio_i16.astype(np.float32) / 32768.0)
 
-def float32_to_wav_bytes(audio: np.ndarray, sr: int = TARGET_SR) -> bytes:
-    """Return WAV‑encoded bytes for a float32 [-1,1] numpy signal."""
-    out = io.BytesIO()
-    sf.write(out, audio, sr, format="WAV", subtype="PCM_16")
-    return out.getvalue()
+def negotiate(sr: int, rate: int, frame: int) -> dict:
+    """Validate connect-time parameters; frame sizes are in samples at the client rate."""
+    if not MIN_CLIENT_SR <= sr <= MAX_CLIENT_SR:
+        raise ValueError(f"sr must be {MIN_CLIENT_SR}-{MAX_CLIENT_SR} Hz, got {sr}")
+    if rate not in LIVE_RATES:
+        raise ValueError(f"rate must be one of {list(LIVE_RATES)}, got {rate}")
+    if not MIN_CHUNK <= frame <= MAX_CHUNK:
+        raise ValueError(f"frame must be {MIN_CHUNK}-{MAX_CHUNK} samples, got {frame}")
+    return {"sr": sr, "rate": rate, "frame": frame, "frame_ms": round(1000.0 * frame / sr, 3),
+            "work_frame": max(round(frame * rate / sr), 1)}
+
+
+def latency_report(session: dict, profile: list[dict], to_working: StreamingResampler,
+                   to_client: StreamingResampler, jitter_ms: float) -> dict:
+    """
+    Where a session's delay comes from: filling one frame, both resamplers'
+    filter delay and what each stage holds back (the algorithmic part), plus
+    the chain's compute per frame against the real-time budget.
+    """
+    resample_ms = 1000.0 * (to_working.delay / to_working.sr_out + to_client.delay / to_client.sr_out)
+    stages_ms = sum(s.get("latency_ms", 0.0) for s in profile)
+    return {
+        "type": "session",
+        **{k: v for k, v in session.items() if k != "work_frame"},
+        "stages": profile,
+        "latency_ms": {
+            "frame": session["frame_ms"],
+            "resample": round(resample_ms, 3),
+            "stages": round(stages_ms, 3),
+            "total": round(session["frame_ms"] + resample_ms + stages_ms, 3),
+            "jitter_target": jitter_ms,   # extra queueing allowed before frames are shed
+        },
+        "process_ms": round(sum(s.get("process_ms", 0.0) for s in profile), 3),
+        "budget_ms": round(REALTIME_HEADROOM * session["frame_ms"], 3),
+    }
 
 # ───────────────────────────────────────────────────────────────────────────
+@router.get("/api/live/stats")
+def live_stats():
+    """Queue depth, drops and frame latency for every open /ws/audio session."""
+    return [stats.snapshot() for stats in ACTIVE_SESSIONS.values()]
+
+
 @router.websocket("/ws/audio")
 async def websocket_audio_stream(
     websocket: WebSocket,
     clarity: bool = Query(False),
     denoise: bool = Query(False),
     pitch: int   = Query(0),
-    speed: float = Query(1.0)
+    speed: float = Query(1.0),
+    sr: int      = Query(RATE),       # client capture rate
+    rate: int    = Query(WORKING_SR), # rate the chain runs at; rate=sr skips resampling
+    frame: int   = Query(CHUNK),      # samples per frame at the client rate (MIN_CHUNK..MAX_CHUNK)
+    preset: str  = Query(""),
+    effect: str  = Query(""),         # fun effect: chipmunk | alien | robot | ...
+    protocol: str = Query("raw"),     # "raw" | "seq" (see api/live_protocol.py)
+    latency_ms: float = Query(DEFAULT_LATENCY_MS),
+    policy: str  = Query("drop"),     # what to do with stale frames: "drop" | "compress"
+    codec_in: str = Query("pcm"),     # "pcm" | "flac"
+    codec_out: str = Query("wav"),    # "wav" | "pcm" | "flac" | "opus"
+    compression_level: Optional[float] = Query(None, ge=0.0, le=1.0),
+    vad: bool = Query(LIVE_VAD_ENABLED)   # skip the chain on silent frames (and attenuate them)
 ):
-    """Bidirectional real‑time audio: receives raw PCM int16, sends back filtered WAV bytes."""
+    """
+    Bidirectional real‑time audio: receives int16 PCM (or FLAC), sends back filtered
+    audio as per‑frame WAV, raw PCM, or one continuous FLAC / Ogg‑Opus stream.
+    Frame size and rates are negotiated at connect time, and a session whose
+    chain cannot keep up with its frame period is refused.
+    Frames are queued in a jitter buffer.  protocol=seq clients also get JSON:
+    a "session" report first (per-stage latency and cost), then a stats
+    message every STATS_INTERVAL_S seconds of audio; raw stays binary-only.
+    """
     await websocket.accept()
 
+    stats = ConnectionStats(preset=preset, effect=effect, pitch=pitch, speed=speed, clarity=clarity,
+                            denoise=denoise, vad=vad, latency_ms=latency_ms, policy=policy,
+                            sr=sr, rate=rate, frame=frame)
     try:
-        while websocket.application_state == WebSocketState.CONNECTED:
-            raw_pcm: bytes = await websocket.receive_bytes()     # ← 2048‑frame int16 buffer
-            audio = int16_to_float32(raw_pcm)
+        session = negotiate(sr, rate, frame)
+        if protocol not in ("raw", "seq"):
+            raise ValueError(f"Unknown protocol '{protocol}'")
+        chain = resolve_chain(preset, pitch_shift=pitch, time_stretch=speed,
+                              clarity=clarity, denoise=denoise, effect=effect)
+        buffer = JitterBuffer(stats, sr, latency_ms, policy)
+        # Codec state lives for the whole connection, not per frame
+        decoder = StreamDecoder(codec_in, sr)
+        encoder = StreamEncoder(codec_out, sr, frame_ms=session["frame_ms"],
+                                compression_level=compression_level)
+        stats.codec = encoder.stats
+    except ValueError as exc:
+        await websocket.close(code=1008, reason=str(exc))
+        return
+    # Pooled processor; stream() gives this connection its own filter state
+    processor = get_processor(chain, rate)
+    process_frame = processor.stream()
+    # The chain still holds stream_latency of speech when the words stop, so the
+    # gate stays open that much past the usual hangover (20 ms for pitch, 0 for
+    # filters).  With no chain there is nothing to save, so no gate.
+    hangover = HANGOVER_MS / 1000.0 + processor.stream_latency
+    gate = StreamingVAD(rate, hangover) if vad and chain else None
+    stats.params["vad"] = gate is not None
 
-            # ── Apply chosen effects, frame‑wise ───────────────────────────
-            if pitch or speed != 1.0:
-                audio = pitch_speed_chunk(audio, TARGET_SR, pitch, speed)
+    # One stateful resampler per direction, so frame edges stay continuous
+    to_working = StreamingResampler(sr, rate)
+    to_client = StreamingResampler(rate, sr)
 
-            if clarity:
-                audio = clarity_boost_chunk(audio, TARGET_SR)
+    # Timed once per (chain, rate, frame) and shared through the processor pool
+    profile = await asyncio.to_thread(processor.stream_profile, session["work_frame"])
+    report = latency_report(session, profile, to_working, to_client, latency_ms)
+    if report["process_ms"] > report["budget_ms"]:
+        await websocket.close(code=1008, reason=f"Chain needs {report['process_ms']:.2f} ms per "
+                                                f"{session['frame_ms']:g} ms frame; negotiate a larger frame")
+        return
+    stats.algorithmic_latency_ms = report["latency_ms"]["total"]
+    if protocol == "seq":
+        await websocket.send_json(report)
+    stats_every = max(1, round(STATS_INTERVAL_S * 1000.0 / session["frame_ms"]))
 
-            if denoise:
-                audio = remove_noise_chunk(audio, TARGET_SR)
-            # ───────────────────────────────────────────────────────────────
+    def render(audio: np.ndarray) -> bytes:
+        audio = to_working.process(audio)
+        if gate is None or gate.is_speech(audio):
+            audio = process_frame(audio)        # ← effect chain, frame‑wise
+        else:
+            stats.gated += 1
+            audio = audio * SILENCE_GAIN        # silence: skip the chain entirely
+        return encoder.encode(to_client.process(audio))
 
-            wav_bytes = float32_to_wav_bytes(audio, TARGET_SR)
-            await websocket.send_bytes(wav_bytes)
+    async def receive_loop():
+        seq = 0
+        while True:
+            message: bytes = await websocket.receive_bytes()     # ← one negotiated frame of int16
+            if protocol == "seq":
+                seq, client_ts, raw_pcm = parse_frame(message)
+            else:
+                client_ts, raw_pcm = 0.0, message
+            audio = decoder.decode(raw_pcm)
+            if len(audio):
+                buffer.push(Frame(seq, client_ts, audio))
+            seq += 1
 
+    async def send_loop():
+        while True:
+            frame = await buffer.get()
+            # Render off the event loop so receiving (and shedding) keeps up
+            payload = await asyncio.to_thread(render, frame.audio)
+            if protocol == "seq":
+                payload = pack_frame(frame.seq, frame.client_ts, payload)
+            if payload:     # stream codecs may still be filling a block
+                await websocket.send_bytes(payload)
+            stats.record_latency(time.monotonic() - frame.received)
+            if protocol == "seq" and stats.frames_out % stats_every == 0:
+                await websocket.send_json({"type": "stats", **stats.snapshot()})
+
+    async def finish():
+        tail = encoder.close()
+        if tail and websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.send_bytes(pack_frame(0xFFFFFFFF, 0.0, tail) if protocol == "seq" else tail)
+
+    ACTIVE_SESSIONS[stats.id] = stats
+    tasks = [asyncio.create_task(receive_loop()), asyncio.create_task(send_loop())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
     except Exception as exc:
         print("[WebSocket closed]", exc)
     finally:
-        await websocket.close()
+        for task in tasks:
+            task.cancel()
+        ACTIVE_SESSIONS.pop(stats.id, None)
+        if (websocket.client_state == WebSocketState.CONNECTED
+                and websocket.application_state == WebSocketState.CONNECTED):
+            await finish()
+            await websocket.close()
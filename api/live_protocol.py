@@ -0,0 +1,176 @@
+# api/live_protocol.py
+
+import asyncio
+import bisect
+import struct
+import time
+import uuid
+from collections import deque
+
+import numpy as np
+
+from audio_engine.effects.wsola import wsola
+
+# ── Wire format ────────────────────────────────────────────────────────────
+# protocol=seq frames carry a small header in both directions:
+#   uint32 seq | float64 client timestamp (ms, echoed back untouched) | payload
+# protocol=raw keeps the original headerless int16 frames.
+HEADER = struct.Struct("<Id")
+
+POLICIES = ("drop", "compress")
+DEFAULT_LATENCY_MS = 300
+MAX_QUEUE = 64             # hard bound on frames held per connection
+LATENCY_WINDOW = 256       # frames kept for percentile stats
+
+
+def parse_frame(message: bytes) -> tuple[int, float, bytes]:
+    if len(message) < HEADER.size:
+        raise ValueError("Frame shorter than header")
+    seq, client_ts = HEADER.unpack_from(message)
+    return seq, client_ts, message[HEADER.size:]
+
+
+def pack_frame(seq: int, client_ts: float, payload: bytes) -> bytes:
+    return HEADER.pack(seq, client_ts) + payload
+
+
+class Frame:
+    __slots__ = ("seq", "client_ts", "received", "audio")
+
+    def __init__(self, seq, client_ts, audio):
+        self.seq = seq
+        self.client_ts = client_ts
+        self.received = time.monotonic()
+        self.audio = audio
+
+
+# ── Per-connection stats ───────────────────────────────────────────────────
+class ConnectionStats:
+    def __init__(self, **params):
+        self.id = uuid.uuid4().hex[:8]
+        self.params = params
+        self.started = time.time()
+        self.frames_in = 0
+        self.frames_out = 0
+        self.dropped = 0
+        self.compressed = 0
+        self.late = 0
+        self.gated = 0             # frames under the VAD gate, effect chain skipped
+        self.algorithmic_latency_ms = None   # frame + resampling + stage delay, from the session report
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.codec = None          # CodecStats of the outbound encoder, if any
+        self._latency_ms = deque(maxlen=LATENCY_WINDOW)
+
+    def record_latency(self, seconds: float):
+        self.frames_out += 1
+        self._latency_ms.append(seconds * 1000.0)
+
+    def snapshot(self) -> dict:
+        lat = np.array(self._latency_ms) if self._latency_ms else np.zeros(1)
+        return {
+            "id": self.id,
+            "params": self.params,
+            "uptime_s": round(time.time() - self.started, 1),
+            "frames_in": self.frames_in,
+            "frames_out": self.frames_out,
+            "dropped": self.dropped,
+            "compressed": self.compressed,
+            "late": self.late,
+            "gated": self.gated,
+            "algorithmic_latency_ms": self.algorithmic_latency_ms,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "latency_ms": {
+                "p50": round(float(np.percentile(lat, 50)), 2),
+                "p95": round(float(np.percentile(lat, 95)), 2),
+                "max": round(float(lat.max()), 2),
+            },
+            "codec": self.codec.snapshot() if self.codec else None,
+        }
+
+
+# Live sessions by id, read by GET /api/live/stats
+ACTIVE_SESSIONS: dict[str, ConnectionStats] = {}
+
+
+# ── Jitter buffer ──────────────────────────────────────────────────────────
+class JitterBuffer:
+    """
+    Seq-ordered frame queue with a latency target.
+
+    Frames arriving behind the playout point are discarded as late. When
+    the backlog holds more audio than `target_ms`, the stale head is either
+    dropped or time-compressed (pitch kept, see effects/wsola.py) into the
+    next frame, so a slow session degrades in quality instead of drifting
+    further behind.
+    """
+
+    def __init__(self, stats: ConnectionStats, sr: int,
+                 target_ms: float = DEFAULT_LATENCY_MS, policy: str = "drop"):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy '{policy}'. Choose from {list(POLICIES)}.")
+        self.stats = stats
+        self.sr = sr
+        self.target_ms = target_ms
+        self.policy = policy
+        self._frames = deque()
+        self._seqs = []            # sorted mirror of frame seqs for ordered insert
+        self._ready = asyncio.Event()
+        self._next_seq = 0
+
+    def __len__(self):
+        return len(self._frames)
+
+    def push(self, frame: Frame):
+        self.stats.frames_in += 1
+        if frame.seq < self._next_seq or frame.seq in self._seqs:
+            self.stats.late += 1
+            return
+
+        i = bisect.bisect(self._seqs, frame.seq)
+        self._seqs.insert(i, frame.seq)
+        self._frames.insert(i, frame)
+        if len(self._frames) > MAX_QUEUE:
+            self._pop()
+            self.stats.dropped += 1
+        self._update_depth()
+        self._ready.set()
+
+    async def get(self) -> Frame:
+        while not self._frames:
+            self._ready.clear()
+            await self._ready.wait()
+        self._shed()
+        frame = self._pop()
+        self._next_seq = frame.seq + 1
+        self._update_depth()
+        return frame
+
+    # ── internals ──
+    def _pop(self) -> Frame:
+        self._seqs.pop(0)
+        return self._frames.popleft()
+
+    def _update_depth(self):
+        self.stats.queue_depth = len(self._frames)
+        self.stats.max_queue_depth = max(self.stats.max_queue_depth, len(self._frames))
+
+    def _shed(self):
+        frame_ms = 1000.0 * len(self._frames[0].audio) / self.sr
+        budget = max(1, int(self.target_ms // max(frame_ms, 1e-3)))
+        excess = len(self._frames) - budget
+        if excess <= 0:
+            return
+
+        stale = [self._pop() for _ in range(excess)]
+        if self.policy == "drop" or not len(self._frames[0].audio):
+            self.stats.dropped += excess
+            return
+
+        # compress: squeeze the stale audio plus the next frame into one frame length
+        head = self._frames[0]
+        joined = np.concatenate([f.audio for f in stale] + [head.audio])
+        head.audio = wsola(joined, len(head.audio), self.sr)
+        head.received = stale[0].received   # latency is measured from the oldest audio
+        self.stats.compressed += excess
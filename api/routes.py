@@ -1,17 +1,180 @@
-from fastapi import APIRouter, UploadFile, File, Form
+from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException, Request, Response
 from fastapi.responses import FileResponse
-from audio_engine.effects import autotune
-from services.file_handler import save_upload_file
-from audio_engine.effects.basic import apply_pitch_and_speed
-from audio_engine.effects.clarity import clarity_boost
-from audio_engine.effects.denoise import remove_noise
+from services.file_handler import save_upload_file, get_filename, ensure_dirs, PROCESSED_DIR
+from services.live_recorder import recording_path
+from audio_engine.pipeline import describe_chain
+from audio_engine.presets import resolve_chain, get_processor, PRESETS
+from audio_engine.analysis import AnalysisContext
+from audio_engine.resample import load_audio
+from audio_engine.stage_cache import STAGE_CACHE, input_key
+from audio_engine.codecs import OUTPUT_FORMATS, negotiate_output, write_audio, encode_bytes
 from models.openai_filter import apply_openai_style
+from models.feature_extraction import extract_features, features_to_vector, vector_to_features
 from database.session_logger import log_transformation
+from services.memory_budget import BUDGET, STATS, MemoryMeter, MemoryBudgetExceeded, estimate_file, probe
+from services import result_store
+from config import PREVIEW_SR, PREVIEW_SECONDS, PREVIEW_MAX_SECONDS
+import asyncio
+from pathlib import Path
 import librosa
-from services.file_handler import ensure_wav
-from audio_engine.effects.autotune import autotune_chunk
 router = APIRouter()
 
+# ✅ Admission budget + observed peak RSS per stage
+@router.get("/memory")
+def memory_stats():
+    return {"budget": BUDGET.snapshot(), "stage_cache": STAGE_CACHE.snapshot(), **STATS.snapshot()}
+
+def _render(raw_path: str, chain: list, meter: MemoryMeter, fmt: str = "wav", bitrate: float | None = None):
+    """Blocking part of a transform (runs in a worker thread): decode → features → chain → encode."""
+    with meter.stage("decode"):
+        y, sr = load_audio(raw_path)
+    # Features come from the same analyses the first stages reuse, and let
+    # them skip work the input doesn't need
+    ctx = AnalysisContext(y, sr)
+    # Both are memoized, so an edit session only re-runs what changed
+    with meter.stage("features"):
+        vector = STAGE_CACHE.get_or_put(f"{input_key(y, sr)}.features",
+                                        lambda: features_to_vector(extract_features(ctx)))
+        ctx.features = vector_to_features(vector)
+    y = get_processor(chain, sr).run(ctx, meter, cache=STAGE_CACHE).y
+
+    ensure_dirs()
+    processed = str(PROCESSED_DIR / f"{get_filename(raw_path)}_processed{OUTPUT_FORMATS[fmt][2]}")
+    with meter.stage("encode"):
+        write_audio(processed, y, sr, fmt, bitrate)
+    return processed, ctx.features
+
+def _serve_result(result_id: str, if_none_match: str | None = None, filename: str | None = None):
+    """
+    Stored result with a strong ETag (its content digest).  FileResponse
+    handles Range / If-Range and hands the file to the server's zero-copy
+    path (pathsend) when it offers one.
+    """
+    path = result_store.result_path(result_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Result not found")
+    headers = {
+        "ETag": result_store.etag(result_id),
+        "Cache-Control": "public, max-age=31536000, immutable",  # content-addressed
+        "Location": f"/api/results/{result_id}",
+        "X-Result-Id": result_id,
+    }
+    if if_none_match and result_store.etag_matches(if_none_match, result_id):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=result_store.media_type(path), filename=filename, headers=headers)
+
+# ✅ Replay / seek a processed result without re-downloading or re-rendering it
+@router.api_route("/results/{result_id}", methods=["GET", "HEAD"])
+def get_result(result_id: str, request: Request):
+    return _serve_result(result_id, request.headers.get("if-none-match"))
+
+def _output_format(output: str, accept: str | None) -> tuple[str, float | None]:
+    """
+    Download format from the `output` form field (Accept syntax, e.g.
+    "audio/mpeg;bitrate=96" or "opus"), else from the Accept header.  A bad
+    field is the client's error; an Accept header with nothing we encode
+    just gets the default WAV.
+    """
+    if output:
+        try:
+            return negotiate_output(output)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    try:
+        return negotiate_output(accept or "")
+    except ValueError:
+        return "wav", None
+
+def _render_preview(raw_path: str, chain: list, start: float, seconds: float,
+                    fmt: str = "wav", bitrate: float | None = None) -> bytes:
+    """
+    Cheap stand-in for _render: decodes only the window, works at PREVIEW_SR
+    with fast analysis, skips feature extraction and stays in memory.
+    Cost depends on the window, not on the file length.
+    """
+    y, sr = load_audio(raw_path, sr=PREVIEW_SR, offset=start, duration=seconds)
+    y = get_processor(chain, sr).run(AnalysisContext(y, sr, fast=True), cache=STAGE_CACHE).y
+    return encode_bytes(y, sr, fmt, bitrate)
+
+# ✅ Available named presets (stage order + params)
+@router.get("/presets")
+def list_presets():
+    return {name: [{"stage": s, **p} for s, p in chain] for name, chain in PRESETS.items()}
+
+async def _transform_file(raw_path: str, file_name: str, pitch_shift: int, time_stretch: float,
+                          clarity: bool, denoise: bool, autotune: bool, style: str, preset: str,
+                          effect: str = "", preview: bool = False, preview_start: float = 0.0,
+                          preview_seconds: float = PREVIEW_SECONDS, output: str = "",
+                          accept: str | None = None):
+    """
+    Shared by uploads and live recordings: chain → optional style → log → response.
+    preview=True renders only [preview_start, +preview_seconds) through the same
+    chain, cheaply and without style, logging or storing a result.
+    The response is encoded as negotiated from `output` / `accept`; styled
+    results stay in whatever format the style filter returns.
+    """
+    fmt, bitrate = _output_format(output, accept)
+    try:
+        chain = resolve_chain(preset, pitch_shift=pitch_shift, time_stretch=time_stretch,
+                              clarity=clarity, denoise=denoise, autotune=autotune, effect=effect)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if preview:
+        start = max(preview_start, 0.0)
+        seconds = min(max(preview_seconds, 0.5), PREVIEW_MAX_SECONDS)
+        total = probe(raw_path)[0]
+        if start >= total:
+            raise HTTPException(status_code=400, detail="Preview window starts past the end of the audio")
+        seconds = min(seconds, total - start)
+        data = await asyncio.to_thread(_render_preview, raw_path, chain, start, seconds, fmt, bitrate)
+        return Response(data, media_type=OUTPUT_FORMATS[fmt][3], headers={
+            "X-Preview-Window": f"{start:g}-{start + seconds:g}",
+            "X-Preview-Rate": str(PREVIEW_SR),
+        })
+
+    # A retry of the same input + parameters gets the stored result back
+    if style:
+        fmt, bitrate = "wav", None      # the style filter reads a WAV
+    key = result_store.request_key(raw_path, chain=chain, style=style, output=fmt, bitrate=bitrate)
+    existing = result_store.lookup(key)
+    if existing:
+        return _serve_result(existing, filename=f"processed{result_store.result_path(existing).suffix}")
+
+    # Reserve the estimated peak first: large uploads queue instead of
+    # running concurrently into an OOM kill
+    stages = ["features"] + [name for name, _ in chain] + (["style"] if style else [])
+    estimated = estimate_file(raw_path, stages)
+    meter = MemoryMeter()
+    try:
+        async with BUDGET.reserve(estimated):
+            processed, features = await asyncio.to_thread(_render, raw_path, chain, meter, fmt, bitrate)
+
+            # Optional OpenAI style filter
+            if style:
+                with meter.stage("style"):
+                    processed = await apply_openai_style(processed, style)
+    except MemoryBudgetExceeded as e:
+        raise HTTPException(status_code=503 if e.retryable else 413, detail=str(e),
+                            headers={"Retry-After": "10"} if e.retryable else None)
+    STATS.record(meter, estimated)
+    result_id = result_store.put(processed, key)
+
+    # Log duration + transformation
+    duration = librosa.get_duration(path=result_store.result_path(result_id))
+    filters = describe_chain(pitch_shift, time_stretch, clarity, denoise, style, effect)
+    if preset:
+        filters.insert(0, f"preset:{preset}")
+    log_transformation(
+        file_name=file_name,
+        filters_used=filters,
+        duration=duration,
+        features=features
+    )
+
+    # Send processed file; later plays / seeks go to GET /api/results/{id}
+    return _serve_result(result_id, filename=f"processed{Path(processed).suffix}")
+
 # ✅ Main route: Upload + all filters + optional OpenAI style
 @router.post("/transform/upload")
 async def upload_and_process_audio(
@@ -20,56 +183,50 @@ async def upload_and_process_audio(
     time_stretch: float = Form(1.0),
     clarity: bool = Form(False),
     denoise: bool = Form(False),
-    style: str = Form("")
+    autotune: bool = Form(False),
+    style: str = Form(""),
+    preset: str = Form(""),
+    effect: str = Form(""),  # fun effect, see audio_engine/effects/meme_filter.py
+    preview: bool = Form(False),
+    preview_start: float = Form(0.0),
+    preview_seconds: float = Form(PREVIEW_SECONDS),
+    output: str = Form(""),  # e.g. "audio/mpeg;bitrate=96" or "opus"; falls back to the Accept header
+    accept: str | None = Header(None)
 ):
     print("Received pitch:", pitch_shift)
     print("Received speed:", time_stretch)
     print("Received clarity:", clarity)
     print("Received denoise:", denoise)
     print("Received style:", style)
+    print("Received preset:", preset)
+    print("Received effect:", effect)
 
-    # 1) Save original upload
     raw_path = await save_upload_file(file, "data/raw")
-    raw_path = ensure_wav(raw_path)
-
-    # 2) Apply pitch/speed
-    processed = apply_pitch_and_speed(raw_path, pitch_shift, time_stretch)
-
-    # 3) Optional clarity / denoise
-    if clarity:
-        processed = clarity_boost(processed)
-    if denoise:
-        processed = remove_noise(processed)
-    if autotune:
-        print("[Autotune] Applying pitch correction")
-        y, sr = librosa.load(processed, sr=None)
-        y = autotune_chunk(y, sr)
-        # Optionally, save the autotuned audio back to a file for further processing
-        import soundfile as sf
-        sf.write(processed, y, sr)
-    # 4) Optional OpenAI style filter
-    if style:
-        processed = await apply_openai_style(processed, style)
-
-    # 5) Log duration
-    duration = librosa.get_duration(path=processed)
-
-    # 6) Write transformation log
-    log_transformation(
-        file_name=file.filename,
-        filters_used=[
-            f"pitch:{pitch_shift}",
-            f"speed:{time_stretch}",
-            f"clarity:{clarity}",
-            f"denoise:{denoise}",
-            f"style:{style or 'none'}"
-        ],
-        duration=duration
-    )
+    return await _transform_file(raw_path, file.filename, pitch_shift, time_stretch,
+                                 clarity, denoise, autotune, style, preset, effect,
+                                 preview, preview_start, preview_seconds, output, accept)
 
-    # 7) Send processed file
-    return FileResponse(
-        processed,
-        media_type="audio/wav",
-        filename="processed.wav"
-    )
+# ✅ Transform a finished /ws/live recording without re-uploading it
+@router.post("/transform/recording/{recording_id}")
+async def transform_recording(
+    recording_id: str,
+    pitch_shift: int = Form(0),
+    time_stretch: float = Form(1.0),
+    clarity: bool = Form(False),
+    denoise: bool = Form(False),
+    autotune: bool = Form(False),
+    style: str = Form(""),
+    preset: str = Form(""),
+    effect: str = Form(""),  # fun effect, see audio_engine/effects/meme_filter.py
+    preview: bool = Form(False),
+    preview_start: float = Form(0.0),
+    preview_seconds: float = Form(PREVIEW_SECONDS),
+    output: str = Form(""),  # e.g. "audio/mpeg;bitrate=96" or "opus"; falls back to the Accept header
+    accept: str | None = Header(None)
+):
+    raw_path = recording_path(recording_id)
+    if not raw_path.exists():
+        raise HTTPException(status_code=404, detail="Recording not found or still in progress")
+    return await _transform_file(str(raw_path), raw_path.name, pitch_shift, time_stretch,
+                                 clarity, denoise, autotune, style, preset, effect,
+                                 preview, preview_start, preview_seconds, output, accept)
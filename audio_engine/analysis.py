@@ -0,0 +1,155 @@
+# audio_engine/analysis.py
+
+import numpy as np
+import librosa
+
+from audio_engine.vad import frame_speech, speech_spans
+from config import VAD_ENABLED
+
+# ────────────────────────────────────────────────────────
+# CONFIG  (librosa defaults, so cached results match ad-hoc calls)
+N_FFT = 2048
+HOP_LENGTH = 512
+F0_MIN = librosa.note_to_hz('C2')
+F0_MAX = librosa.note_to_hz('C7')
+FAST_VOICED_DB = -30.0   # fast mode: frames within this of the loudest count as voiced
+
+
+class AnalysisContext:
+    """
+    Per-request analysis cache.
+
+    Holds the current signal and lazily computes STFT, magnitude, frame
+    energy and f0, each at most once per parameter set.  Assigning a new
+    signal (update()) drops everything, so a stage that changes the audio
+    can never hand stale analysis to the next one.
+
+    Works for a single clip (n,) or a stack of clips (clips, n); results
+    then carry the same leading axis.
+
+    `features` holds the ingest feature vector(s) from
+    models/feature_extraction.py.  They describe the input, not the current
+    signal, so update() keeps them.
+
+    `lengths` gives each row's real length when a stack is zero-padded
+    (api/batch.py); update() rescales it when a stage changes the length,
+    and valid_frames() turns it into a per-row frame mask.
+
+    fast=True trades accuracy for time (previews): f0 comes from yin with
+    energy-based voicing instead of pyin.  vad=True runs pyin on speech
+    regions only and lets stages do the same (audio_engine/vad.py).
+    """
+
+    def __init__(self, y: np.ndarray, sr: int, fast: bool = False, vad: bool = VAD_ENABLED):
+        self.sr = sr
+        self.fast = fast
+        self.vad = vad
+        self._y = np.asarray(y, dtype=np.float32)
+        self._cache = {}
+        self.features = None
+        self.lengths = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def y(self) -> np.ndarray:
+        return self._y
+
+    def update(self, y: np.ndarray):
+        """Replace the signal; a no-op when a stage handed back the same buffer."""
+        if y is self._y:
+            return
+        y = np.asarray(y, dtype=np.float32)
+        if self.lengths is not None and y.shape[-1] != self._y.shape[-1]:
+            scale = y.shape[-1] / self._y.shape[-1]
+            self.lengths = [int(round(n * scale)) for n in self.lengths]
+        self._y = y
+        self._cache.clear()
+
+    def memo(self, key: tuple, compute):
+        if key in self._cache:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    # ── Analyses ──
+    def stft(self, n_fft: int = N_FFT, hop_length: int = HOP_LENGTH) -> np.ndarray:
+        return self.memo(("stft", n_fft, hop_length),
+                         lambda: librosa.stft(self._y, n_fft=n_fft, hop_length=hop_length))
+
+    def magnitude(self, n_fft: int = N_FFT, hop_length: int = HOP_LENGTH) -> np.ndarray:
+        return self.memo(("magnitude", n_fft, hop_length),
+                         lambda: np.abs(self.stft(n_fft, hop_length)))
+
+    def frame_energy(self, n_fft: int = N_FFT, hop_length: int = HOP_LENGTH) -> np.ndarray:
+        """RMS per frame, derived from the cached magnitude instead of re-framing."""
+        return self.memo(("rms", n_fft, hop_length),
+                         lambda: librosa.feature.rms(S=self.magnitude(n_fft, hop_length),
+                                                     frame_length=n_fft)[..., 0, :])
+
+    def valid_frames(self, n_fft: int = N_FFT, hop_length: int = HOP_LENGTH) -> np.ndarray | None:
+        """
+        (clips, frames) flags for STFT frames whose window lies inside the
+        row's real length, or None when nothing is padded.  The first frame
+        always counts, so very short clips keep at least one.
+        """
+        if self.lengths is None:
+            return None
+
+        def compute():
+            starts = np.arange(1 + self._y.shape[-1] // hop_length) * hop_length
+            valid = starts[np.newaxis, :] + n_fft // 2 <= np.asarray(self.lengths)[:, np.newaxis]
+            valid[:, 0] = True
+            return valid
+        return self.memo(("valid", n_fft, hop_length), compute)
+
+    def f0(self, fmin: float = F0_MIN, fmax: float = F0_MAX, frame_length: int = N_FFT):
+        """(f0, voiced_flag, voiced_prob) from pyin, or yin in fast mode."""
+        if self.fast:
+            return self.memo(("f0_fast", fmin, fmax, frame_length),
+                             lambda: self._fast_f0(fmin, fmax, frame_length))
+        if self.vad:
+            return self.memo(("f0_speech", fmin, fmax, frame_length),
+                             lambda: self._speech_f0(fmin, fmax, frame_length))
+        return self.memo(("f0", fmin, fmax, frame_length),
+                         lambda: librosa.pyin(self._y, fmin=fmin, fmax=fmax, sr=self.sr,
+                                              frame_length=frame_length))
+
+    def speech_mask(self) -> np.ndarray:
+        """VAD speech flags on the STFT frame grid, (frames,) or (clips, frames)."""
+        return self.memo(("vad",), lambda: frame_speech(self._y, self.sr, HOP_LENGTH))
+
+    def speech_spans(self) -> list[tuple[int, int]]:
+        """Speech sample ranges of a single clip."""
+        return self.memo(("vad_spans",),
+                         lambda: speech_spans(self.speech_mask(), self._y.shape[-1], HOP_LENGTH))
+
+    def _speech_f0(self, fmin, fmax, frame_length):
+        # pyin only where there is speech; silence is unvoiced by definition
+        hop = frame_length // 4     # pyin's default, as in the full-signal call
+        rows, masks = np.atleast_2d(self._y), np.atleast_2d(self.speech_mask())
+        frames = 1 + rows.shape[-1] // hop
+        f0 = np.full((len(rows), frames), np.nan)
+        voiced = np.zeros((len(rows), frames), dtype=bool)
+        prob = np.zeros((len(rows), frames))
+        for r, (row, mask) in enumerate(zip(rows, masks)):
+            for s, e in speech_spans(mask, len(row), HOP_LENGTH):
+                f, v, p = librosa.pyin(row[s:e], fmin=fmin, fmax=fmax, sr=self.sr,
+                                       frame_length=frame_length)
+                a = s // hop
+                k = min(f.shape[-1], frames - a)
+                f0[r, a:a + k], voiced[r, a:a + k], prob[r, a:a + k] = f[:k], v[:k], p[:k]
+        if self._y.ndim == 1:
+            return f0[0], voiced[0], prob[0]
+        return f0, voiced, prob
+
+    def _fast_f0(self, fmin, fmax, frame_length):
+        # yin and the cached STFT share centring and hop, so frames line up
+        f0 = librosa.yin(self._y, fmin=fmin, fmax=fmax, sr=self.sr, frame_length=frame_length)
+        rms = self.frame_energy(frame_length)
+        db = 20.0 * np.log10(np.maximum(rms, 1e-10) / np.maximum(rms.max(axis=-1, keepdims=True), 1e-10))
+        n = min(f0.shape[-1], db.shape[-1])
+        f0, voiced = f0[..., :n], db[..., :n] > FAST_VOICED_DB
+        return np.where(voiced, f0, np.nan), voiced, voiced.astype(np.float32)
@@ -0,0 +1,422 @@
+# audio_engine/codecs.py
+
+import io
+import struct
+import time
+
+import numpy as np
+import soundfile as sf
+
+try:
+    # Private, but the only way to read unsized streams and set Ogg page latency
+    from soundfile import _ffi, _snd
+except ImportError:
+    _ffi = _snd = None
+
+from audio_engine.resample import resample
+
+# ────────────────────────────────────────────────────────
+# CONFIG
+#   name -> (libsndfile format, subtype)
+CODECS = {
+    "flac": ("FLAC", "PCM_16"),
+    "opus": ("OGG", "OPUS"),
+}
+LIVE_OUT_CODECS = ("wav", "pcm", "flac", "opus")   # wav = one WAV file per frame (legacy)
+LIVE_IN_CODECS = ("pcm", "flac")
+OPUS_RATES = (8000, 12000, 16000, 24000, 48000)
+MP3_RATES = (8000, 11025, 12000, 16000, 22050, 24000, 32000, 44100, 48000)
+
+# Downloads:  name -> (libsndfile format, subtype, file suffix, media type)
+OUTPUT_FORMATS = {
+    "wav": ("WAV", "PCM_16", ".wav", "audio/wav"),
+    "flac": ("FLAC", "PCM_16", ".flac", "audio/flac"),
+    "opus": ("OGG", "OPUS", ".opus", "audio/ogg"),
+    "mp3": ("MP3", "MPEG_LAYER_III", ".mp3", "audio/mpeg"),
+}
+# Accept-style media types -> output format
+MEDIA_TYPES = {
+    "audio/wav": "wav", "audio/x-wav": "wav", "audio/wave": "wav", "audio/vnd.wave": "wav",
+    "audio/flac": "flac", "audio/x-flac": "flac",
+    "audio/ogg": "opus", "audio/opus": "opus",
+    "audio/mpeg": "mp3", "audio/mp3": "mp3",
+}
+DEFAULT_BITRATE = {"opus": 64, "mp3": 128}      # kbps, lossy formats only
+ENCODE_BLOCK = 65536                            # samples per libsndfile write
+
+# libsndfile sf_command ids (sndfile.h)
+SFC_SET_OGG_PAGE_LATENCY_MS = 0x1302
+SOUNDFILE_TESTED = "0.14.0"       # keep in step with requirements.txt
+
+READ_BLOCK = 4096
+
+
+def _libsndfile(f: sf.SoundFile):
+    """
+    (ffi, lib, SNDFILE*) behind an open SoundFile.  These are soundfile
+    internals, so every private access goes through here and fails loudly
+    if a soundfile upgrade has moved them.
+    """
+    handle = getattr(f, "_file", None)
+    if _snd is None or _ffi is None or handle is None:
+        raise RuntimeError(
+            f"soundfile {getattr(sf, '__version__', '?')} does not expose the libsndfile "
+            f"handle streaming codecs need (tested with soundfile=={SOUNDFILE_TESTED})"
+        )
+    return _ffi, _snd, handle
+
+
+def _set_double(f: sf.SoundFile, command: int, value: float):
+    ffi, lib, handle = _libsndfile(f)
+    lib.sf_command(handle, command, ffi.new("double*", value), ffi.sizeof("double"))
+
+
+def _read_all(f: sf.SoundFile) -> np.ndarray:
+    """
+    Read until libsndfile runs dry.  Streams have no frame count in their
+    header, which trips SoundFile.read(), so this goes through sf_readf_float.
+    """
+    ffi, lib, handle = _libsndfile(f)
+    blocks = []
+    while True:
+        block = np.empty(READ_BLOCK * f.channels, dtype=np.float32)
+        n = lib.sf_readf_float(handle, ffi.cast("float*", block.ctypes.data), READ_BLOCK)
+        blocks.append(block[:n * f.channels])
+        if n < READ_BLOCK:
+            break
+    return np.concatenate(blocks)
+
+
+class _ByteSink:
+    """
+    Seekable in-memory target for libsndfile.  drain() hands out new bytes
+    once and forgets them, so a long session does not accumulate output.
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._base = 0          # stream offset of _buf[0]
+        self._pos = 0
+
+    def write(self, data):
+        data = bytes(data)
+        end = self._pos + len(data)
+        start = max(self._pos, self._base)
+        # Header rewrites on close land before _base and are dropped: live
+        # streams are decoded without a total length anyway.
+        if end > start:
+            if end - self._base > len(self._buf):
+                self._buf.extend(b"\0" * (end - self._base - len(self._buf)))
+            self._buf[start - self._base:end - self._base] = data[start - self._pos:]
+        self._pos = end
+        return len(data)
+
+    def read(self, size=-1):
+        start = max(self._pos - self._base, 0)
+        data = self._buf[start:] if size < 0 else self._buf[start:start + size]
+        self._pos += len(data)
+        return bytes(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        end = self._base + len(self._buf)
+        self._pos = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: end}[whence] + offset
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def drain(self) -> bytes:
+        out = bytes(self._buf)
+        self._base += len(self._buf)
+        self._buf.clear()
+        return out
+
+
+# ────────────────────────────────────────────────────────
+# STREAMING ENCODER / DECODER
+
+class CodecStats:
+    def __init__(self):
+        self.frames = 0
+        self.pcm_bytes = 0
+        self.coded_bytes = 0
+        self.last_encode_ms = 0.0
+        self.total_encode_ms = 0.0
+
+    def record(self, seconds: float, pcm_bytes: int, coded_bytes: int):
+        self.frames += 1
+        self.last_encode_ms = seconds * 1000.0
+        self.total_encode_ms += self.last_encode_ms
+        self.pcm_bytes += pcm_bytes
+        self.coded_bytes += coded_bytes
+
+    def snapshot(self) -> dict:
+        return {
+            "frames": self.frames,
+            "last_encode_ms": round(self.last_encode_ms, 3),
+            "avg_encode_ms": round(self.total_encode_ms / max(self.frames, 1), 3),
+            "compression_ratio": round(self.pcm_bytes / max(self.coded_bytes, 1), 2),
+        }
+
+
+class StreamEncoder:
+    """
+    One encoder per connection, kept open for the whole session.
+    encode() returns whatever compressed bytes the codec has ready
+    (possibly b"" while it fills a block); close() flushes the rest.
+    """
+
+    def __init__(self, codec: str, sr: int, frame_ms: float = 20.0,
+                 compression_level: float | None = None):
+        if codec not in LIVE_OUT_CODECS:
+            raise ValueError(f"Unknown codec '{codec}'. Choose from {list(LIVE_OUT_CODECS)}.")
+        if codec == "opus" and sr not in OPUS_RATES:
+            raise ValueError(f"Opus needs one of {OPUS_RATES} Hz, got {sr}")
+        self.codec = codec
+        self.sr = sr
+        self.stats = CodecStats()
+        self._sink = None
+        self._file = None
+
+        if codec in CODECS:
+            fmt, subtype = CODECS[codec]
+            if compression_level is None and codec == "flac":
+                # Level 0 uses 1152-sample blocks, so bytes leave with less delay
+                compression_level = 0.0
+            self._sink = _ByteSink()
+            self._file = sf.SoundFile(self._sink, "w", samplerate=sr, channels=1,
+                                      format=fmt, subtype=subtype,
+                                      compression_level=compression_level)
+            if codec == "opus":
+                # Emit an Ogg page per frame instead of libsndfile's ~1 s default
+                _set_double(self._file, SFC_SET_OGG_PAGE_LATENCY_MS, frame_ms)
+
+    def encode(self, audio: np.ndarray) -> bytes:
+        start = time.perf_counter()
+        audio = np.clip(np.asarray(audio, dtype=np.float32), -1.0, 1.0)
+        if self.codec == "pcm":
+            out = (audio * 32767).astype(np.int16).tobytes()
+        elif self.codec == "wav":
+            buf = io.BytesIO()
+            sf.write(buf, audio, self.sr, format="WAV", subtype="PCM_16")
+            out = buf.getvalue()
+        else:
+            self._file.write(audio)
+            out = self._sink.drain()
+        self.stats.record(time.perf_counter() - start, audio.size * 2, len(out))
+        return out
+
+    def close(self) -> bytes:
+        if self._file is None or self._file.closed:
+            return b""
+        self._file.close()
+        return self._sink.drain()
+
+
+def _flac_header_length(data: bytes) -> int:
+    """Bytes up to the first audio frame ("fLaC" + metadata blocks), or 0 if incomplete."""
+    if len(data) < 4 or data[:4] != b"fLaC":
+        return 0
+    pos = 4
+    while pos + 4 <= len(data):
+        is_last = data[pos] & 0x80
+        length = struct.unpack(">I", b"\0" + data[pos + 1:pos + 4])[0]
+        pos += 4 + length
+        if is_last:
+            return pos if pos <= len(data) else 0
+    return 0
+
+
+class StreamDecoder:
+    """
+    One decoder per connection for client -> server audio.
+
+    libsndfile cannot resume a stream after it has hit EOF, so the FLAC
+    stream header is parsed once and cached, and each message (whole FLAC
+    frames, as any streaming FLAC encoder emits them) is decoded behind it.
+    FLAC frames are independent, so this is exact.
+    """
+
+    def __init__(self, codec: str, sr: int):
+        if codec not in LIVE_IN_CODECS:
+            raise ValueError(f"Unknown codec '{codec}'. Choose from {list(LIVE_IN_CODECS)}.")
+        self.codec = codec
+        self.sr = sr
+        self._header = b""
+        self._pending = b""
+
+    def decode(self, data: bytes) -> np.ndarray:
+        if self.codec == "pcm":
+            return np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+
+        if not self._header:
+            self._pending += data
+            n = _flac_header_length(self._pending)
+            if not n:
+                return np.zeros(0, dtype=np.float32)
+            self._header, data = self._pending[:n], self._pending[n:]
+            self._pending = b""
+        if not data:
+            return np.zeros(0, dtype=np.float32)
+
+        with sf.SoundFile(io.BytesIO(self._header + data)) as f:
+            audio = _read_all(f)
+            if f.samplerate != self.sr:
+                raise ValueError(f"Stream is {f.samplerate} Hz, session negotiated {self.sr} Hz")
+        return audio
+
+
+# ────────────────────────────────────────────────────────
+# DOWNLOAD ENCODING
+#
+# Whole results are encoded in-process by libsndfile, MP3 included (it
+# links LAME), so a download costs no subprocess and no temp file.  Lossy
+# formats run at constant bitrate: libsndfile only exposes a 0..1
+# compression level, which in CBR mode maps linearly onto a fixed kbps
+# range per codec and rate.
+
+
+def negotiate_output(accept: str, default: str = "wav") -> tuple[str, float | None]:
+    """
+    Pick (format, kbps) from an Accept-style list such as
+        "audio/mpeg;bitrate=96, audio/flac;q=0.5"   or   "opus;bitrate=32"
+    Highest q wins, earlier entries break ties, wildcards mean `default`.
+    An empty string is `default`; a list with nothing usable is a ValueError.
+    """
+    best = None
+    for entry in accept.split(","):
+        kind, *params = [part.strip() for part in entry.split(";")]
+        kind = kind.lower()
+        if not kind:
+            continue
+        params = {k.strip().lower(): v.strip() for k, _, v in (p.partition("=") for p in params)}
+        try:
+            q = float(params.get("q", 1.0))
+        except ValueError:
+            continue
+        name = default if kind in ("*/*", "audio/*") else MEDIA_TYPES.get(kind, kind)
+        if name in OUTPUT_FORMATS and q > 0 and (best is None or q > best[0]):
+            best = (q, name, params.get("bitrate"))
+
+    if best is None:
+        if accept.strip():
+            raise ValueError(f"No supported output format in '{accept}'. Choose from {list(OUTPUT_FORMATS)}.")
+        return default, None
+    _, name, bitrate = best
+    if bitrate is None:
+        return name, None
+    try:
+        kbps = float(bitrate.lower().removesuffix("k"))
+    except ValueError:
+        raise ValueError(f"Invalid bitrate '{bitrate}' (kbps)")
+    if kbps <= 0:
+        raise ValueError(f"Invalid bitrate '{bitrate}' (kbps)")
+    return name, kbps
+
+
+def output_rate(fmt: str, sr: int) -> int:
+    """Closest rate the codec can carry, never below `sr` unless it has to be."""
+    rates = {"opus": OPUS_RATES, "mp3": MP3_RATES}.get(fmt)
+    if rates is None or sr in rates:
+        return sr
+    return min((r for r in rates if r >= sr), default=rates[-1])
+
+
+def _bitrate_range(fmt: str, sr: int) -> tuple[float, float]:
+    """kbps at compression level 1.0 and 0.0 (libsndfile, CBR)."""
+    if fmt == "opus":
+        return 6.0, 256.0
+    if sr >= 32000:
+        return 32.0, 320.0
+    if sr >= 16000:
+        return 8.0, 160.0
+    return 8.0, 64.0
+
+
+class FileEncoder:
+    """
+    Block-by-block encoder into a path or a file object (seekable, or a
+    _ByteSink for streaming).  write() accepts float32 blocks of any size at
+    the rate given, which must suit the codec (see output_rate()).
+    """
+
+    def __init__(self, target, fmt: str, sr: int, bitrate: float | None = None):
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format '{fmt}'. Choose from {list(OUTPUT_FORMATS)}.")
+        if output_rate(fmt, sr) != sr:
+            raise ValueError(f"{fmt} cannot encode {sr} Hz")
+        major, subtype = OUTPUT_FORMATS[fmt][:2]
+        self.fmt = fmt
+        self.sr = sr
+        options = {}
+        if fmt in DEFAULT_BITRATE:
+            lo, hi = _bitrate_range(fmt, sr)
+            kbps = min(max(bitrate or DEFAULT_BITRATE[fmt], lo), hi)
+            options = {"compression_level": (hi - kbps) / (hi - lo)}
+            if fmt == "mp3":
+                # Opus rejects a bitrate mode; its quality setting is already near-CBR
+                options["bitrate_mode"] = "CONSTANT"
+        self._file = sf.SoundFile(target, "w", samplerate=sr, channels=1,
+                                  format=major, subtype=subtype, **options)
+
+    def write(self, block: np.ndarray):
+        # libsndfile wraps rather than clips when converting to integer PCM
+        self._file.write(np.clip(np.asarray(block, dtype=np.float32), -1.0, 1.0))
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _wav_header(n: int, sr: int) -> bytes:
+    """44-byte PCM_16 mono header for a known length."""
+    size = 2 * n
+    return struct.pack("<4sI4s4sIHHIIHH4sI", b"RIFF", 36 + size, b"WAVE", b"fmt ", 16,
+                       1, 1, sr, 2 * sr, 2, 16, b"data", size)
+
+
+def write_audio(path: str, y: np.ndarray, sr: int, fmt: str, bitrate: float | None = None) -> str:
+    """Encode a whole signal to `path` (resampling first if the codec needs it)."""
+    rate = output_rate(fmt, sr)
+    y = resample(y, sr, rate) if rate != sr else y
+    with FileEncoder(path, fmt, rate, bitrate) as enc:
+        for i in range(0, len(y), ENCODE_BLOCK):
+            enc.write(y[i:i + ENCODE_BLOCK])
+    return path
+
+
+def iter_encoded(y: np.ndarray, sr: int, fmt: str, bitrate: float | None = None):
+    """
+    Encoded bytes as each block is done, for streaming responses.  Headers
+    libsndfile would patch on close cannot be sent twice, so WAV gets its
+    header up front from the known length, and FLAC streams leave the
+    total length unset.
+    """
+    rate = output_rate(fmt, sr)
+    y = resample(y, sr, rate) if rate != sr else y
+    if fmt == "wav":
+        yield _wav_header(len(y), rate)
+        for i in range(0, len(y), ENCODE_BLOCK):
+            yield (np.clip(y[i:i + ENCODE_BLOCK], -1.0, 1.0) * 32767).astype("<i2").tobytes()
+        return
+
+    sink = _ByteSink()
+    with FileEncoder(sink, fmt, rate, bitrate) as enc:
+        for i in range(0, len(y), ENCODE_BLOCK):
+            enc.write(y[i:i + ENCODE_BLOCK])
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def encode_bytes(y: np.ndarray, sr: int, fmt: str, bitrate: float | None = None) -> bytes:
+    return b"".join(iter_encoded(y, sr, fmt, bitrate))
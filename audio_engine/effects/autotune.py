@@ -5,15 +5,19 @@ import librosa
 import soundfile as sf
 import tempfile
 import subprocess
+from functools import lru_cache
 from scipy.interpolate import interp1d
 from pathlib import Path
 
 
-def estimate_and_interpolate_f0(y, sr):
-    """ Estimate fundamental frequency and interpolate unvoiced frames. """
-    f0, voiced_flag, _ = librosa.pyin(y,
-                                      fmin=librosa.note_to_hz('C2'),
-                                      fmax=librosa.note_to_hz('C7'))
+def estimate_and_interpolate_f0(y, sr, f0=None):
+    """ Estimate fundamental frequency and interpolate unvoiced frames.
+    Pass a precomputed pyin `f0` track to skip the estimation. """
+    if f0 is None:
+        f0, voiced_flag, _ = librosa.pyin(y,
+                                          fmin=librosa.note_to_hz('C2'),
+                                          fmax=librosa.note_to_hz('C7'),
+                                          sr=sr)
 
     # Interpolate missing (unvoiced) values
     indices = np.arange(len(f0))
@@ -27,21 +31,28 @@ def estimate_and_interpolate_f0(y, sr):
     return interp_fn(indices)
 
 
-def snap_f0_to_scale(f0, scale='C'):
-    """ Snap each f0 to nearest note in the chosen scale. """
+@lru_cache(maxsize=8)
+def scale_frequencies(scale='C'):
+    """ Frequency table for a scale, built once per scale. """
     notes = ['C', 'D', 'E', 'F', 'G', 'A', 'B']
-    scale_freqs = [librosa.note_to_hz(f"{n}4") for n in notes]
+    freqs = np.array([librosa.note_to_hz(f"{n}4") for n in notes])
+    freqs.setflags(write=False)
+    return freqs
 
-    snapped = np.array([min(scale_freqs, key=lambda x: abs(x - pitch)) if pitch > 0 else pitch
-                        for pitch in f0])
-    return snapped
+
+def snap_f0_to_scale(f0, scale='C'):
+    """ Snap each f0 to nearest note in the chosen scale. """
+    f0 = np.asarray(f0, dtype=float)
+    scale_freqs = scale_frequencies(scale)
+    nearest = scale_freqs[np.argmin(np.abs(f0[:, None] - scale_freqs[None, :]), axis=1)]
+    return np.where(f0 > 0, nearest, f0)
 
 
-def autotune_chunk(y, sr, scale='C'):
+def autotune_chunk(y, sr, scale='C', f0=None):
     """ Autotune signal by estimating pitch and snapping to musical scale. """
     print(">> [Autotune] Starting studio-grade processing")
 
-    f0 = estimate_and_interpolate_f0(y, sr)
+    f0 = estimate_and_interpolate_f0(y, sr, f0)
     if f0 is None:
         print("[Autotune] Skipping autotune (insufficient voiced signal)")
         return y
@@ -6,10 +6,12 @@ from pydub import AudioSegment
 from pedalboard import Pedalboard, PitchShift
 from io import BytesIO
 
+from audio_engine.resample import load_audio
+
 # ⏺️ FILE-BASED
 def apply_pitch_and_speed(input_path, pitch_shift=0, time_stretch=1.0):
     print(f">> Applying pitch {pitch_shift}, speed {time_stretch}")
-    y, sr = librosa.load(input_path, sr=None)
+    y, sr = load_audio(input_path)  # single resample into the working rate
 
     # Time Stretch (first)
     if time_stretch != 1.0:
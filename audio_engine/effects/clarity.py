@@ -4,6 +4,7 @@ from pydub import AudioSegment
 import numpy as np
 import librosa
 import soundfile as sf
+from functools import lru_cache
 from scipy.signal import butter, lfilter
 
 # ────────────────────────────────────────────────────────
@@ -15,11 +16,17 @@ PCM_MAX = 32767
 # ────────────────────────────────────────────────────────
 # HELPERS
 
-def highpass_filter(data, cutoff=DEFAULT_CUTOFF, fs=16000, order=DEFAULT_ORDER):
-    """Apply a high-pass Butterworth filter to remove low frequencies."""
+@lru_cache(maxsize=16)
+def highpass_coeffs(cutoff=DEFAULT_CUTOFF, fs=16000, order=DEFAULT_ORDER):
+    """Butterworth (b, a) for a cutoff / rate pair, designed once and reused."""
     nyq = 0.5 * fs
     normal_cutoff = cutoff / nyq
-    b, a = butter(order, normal_cutoff, btype="high", analog=False)
+    return butter(order, normal_cutoff, btype="high", analog=False)
+
+
+def highpass_filter(data, cutoff=DEFAULT_CUTOFF, fs=16000, order=DEFAULT_ORDER):
+    """Apply a high-pass Butterworth filter to remove low frequencies."""
+    b, a = highpass_coeffs(cutoff, fs, order)
     return lfilter(b, a, data)
 
 
@@ -6,6 +6,7 @@ import librosa
 import soundfile as sf
 import noisereduce as nr
 from pydub import AudioSegment
+from scipy.ndimage import uniform_filter1d
 
 # ⏺️ File-based studio denoise
 def remove_noise(input_path: str, output_path: str = None) -> str:
@@ -21,6 +22,42 @@ def remove_noise(input_path: str, output_path: str = None) -> str:
     return output_path
 
 
+# 🧮 STFT-domain gate (works on a shared / precomputed STFT)
+def noise_profile(D: np.ndarray, quiet: np.ndarray | None = None):
+    """Per-bin (mean, std) in dB over the `quiet` frames of D (all frames when None)."""
+    mag_db = librosa.amplitude_to_db(np.abs(D), ref=1.0, top_db=None)
+    if quiet is None:
+        quiet = np.ones(mag_db.shape[-1], dtype=bool)
+    quiet = quiet[..., np.newaxis, :]
+    count = np.maximum(quiet.sum(axis=-1, keepdims=True), 1)
+    noise_mean = (mag_db * quiet).sum(axis=-1, keepdims=True) / count
+    noise_std = np.sqrt((((mag_db - noise_mean) ** 2) * quiet).sum(axis=-1, keepdims=True) / count)
+    return noise_mean, noise_std
+
+
+def spectral_gate(D: np.ndarray, frame_energy: np.ndarray | None = None, n_std: float = 1.5,
+                  prop_decrease: float = 1.0, noise_quantile: float = 0.1,
+                  smooth_frames: int = 3, noise=None, valid: np.ndarray | None = None) -> np.ndarray:
+    """
+    Stationary spectral gating on an existing STFT, so the pipeline does not
+    need a second transform just for denoising.  The noise profile comes from
+    the quietest `noise_quantile` of frames, or is passed in as `noise`
+    (see noise_profile) when D holds speech only.  Returns the gated STFT.
+    D may be (freq, frames) or (clips, freq, frames); for a zero-padded
+    stack, `valid` flags each row's real frames so the padding (the
+    quietest audio there is) never becomes the noise profile.
+    """
+    mag_db = librosa.amplitude_to_db(np.abs(D), ref=1.0, top_db=None)
+    if noise is None:
+        energy = frame_energy if valid is None else np.where(valid, frame_energy, np.nan)
+        quiet = energy <= np.nanquantile(energy, noise_quantile, axis=-1, keepdims=True)
+        noise = noise_profile(D, quiet)
+    noise_mean, noise_std = noise
+
+    mask = (mag_db > noise_mean + n_std * noise_std).astype(np.float32)
+    mask = uniform_filter1d(mask, size=smooth_frames, axis=-1)
+    return D * (1.0 - prop_decrease * (1.0 - mask))
+
 
 # 🔁 Real-time chunk-based denoise
 def remove_noise_chunk(data: bytes, frame_rate: int = 16000) -> bytes:
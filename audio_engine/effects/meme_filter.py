@@ -1,23 +1,109 @@
-# File: effects/fun_filters.py
-  # in meme_filter.py
+# audio_engine/effects/meme_filter.py
+
 import librosa
 import numpy as np
 import soundfile as sf
-import os
+
+from audio_engine.effects.pitch_shift import PitchShifter, WINDOW_MS
+
+# ────────────────────────────────────────────────────────
+# FUN EFFECTS REGISTRY
+#
+# Every effect is a class with carried state: process(chunk) continues
+# where the previous chunk stopped, and block(y, sr) is one fresh stream
+# over the whole signal, so live and file output sound the same.  Chunks
+# may be (n,) or (clips, n).  Register a new one with:
+#
+#     @register_effect("name")
+#     class MyEffect(FunEffect):
+#         def reset(self): ...
+#         def process(self, chunk): ...
+#
+# It is then available as stage ("fun", {"effect": "name"}) on uploads,
+# batches and /ws/audio (see audio_engine/pipeline.py).
+
+EFFECTS = {}
+
+
+def register_effect(name: str):
+    def decorator(cls):
+        cls.name = name
+        EFFECTS[name] = cls
+        return cls
+    return decorator
+
+
+def get_effect(name: str):
+    if name not in EFFECTS:
+        raise ValueError(f"Unsupported effect '{name}'. Choose from {list(EFFECTS)}.")
+    return EFFECTS[name]
+
+
+class FunEffect:
+    name = ""
+    latency = 0.0       # seconds process() holds audio back
+
+    def __init__(self, sr: int):
+        self.sr = sr
+        self.reset()
+
+    def reset(self):
+        """Drop carried state, as if the stream started again."""
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    @classmethod
+    def block(cls, y: np.ndarray, sr: int) -> np.ndarray:
+        return cls(sr).process(y)
+
+
+class _Shift(FunEffect):
+    semitones = 0
+    latency = WINDOW_MS / 2000.0
+
+    def reset(self):
+        self._shifter = PitchShifter(self.sr, self.semitones)
+
+    def process(self, chunk):
+        return self._shifter.process(chunk)
+
+
+@register_effect("chipmunk")
+class Chipmunk(_Shift):
+    semitones = 8
+
+
+@register_effect("alien")
+class Alien(_Shift):
+    semitones = -6
+
+
+@register_effect("robot")
+class Robot(FunEffect):
+    """30 Hz ring modulator; oscillator phase is kept in cycles so it never loses precision."""
+    freq = 30.0
+
+    def reset(self):
+        self._phase = 0.0
+
+    def process(self, chunk):
+        chunk = np.asarray(chunk, dtype=np.float32)
+        n = chunk.shape[-1]
+        step = self.freq / self.sr
+        carrier = np.sin(2 * np.pi * (self._phase + step * np.arange(n))).astype(np.float32)
+        self._phase = (self._phase + step * n) % 1.0
+        return chunk * carrier
+
+
+# ────────────────────────────────────────────────────────
+# FILE-BASED
 
 def apply_fun_filter(input_path: str, effect: str) -> str:
-    print(f">> Applying fun filter: {effect}")   # ✅ inside the function
+    print(f">> Applying fun filter: {effect}")
 
     y, sr = librosa.load(input_path, sr=None)
-
-    if effect == "chipmunk":
-        y_mod = librosa.effects.pitch_shift(y, sr, n_steps=8)
-    elif effect == "robot":
-        y_mod = y * np.sin(2 * np.pi * 30 * np.arange(len(y)) / sr)
-    elif effect == "alien":
-        y_mod = librosa.effects.pitch_shift(y, sr, n_steps=-6)
-    else:
-        raise ValueError("Unsupported effect")
+    y_mod = get_effect(effect).block(y, sr)
 
     output_path = input_path.replace(".wav", f"_{effect}.wav")
     sf.write(output_path, y_mod, sr)
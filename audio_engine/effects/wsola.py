@@ -0,0 +1,57 @@
+# audio_engine/effects/wsola.py
+
+import numpy as np
+
+# ────────────────────────────────────────────────────────
+# CONFIG
+WINDOW_MS = 20.0   # grain length: long enough for one or two pitch periods
+
+# ────────────────────────────────────────────────────────
+# WSOLA TIME COMPRESSION
+#
+# Waveform-similarity overlap-add: Hann grains are laid down every half
+# window in the output, and each one is read from near its nominal input
+# position, at the offset that best continues the previous grain.  Grains
+# are copied, never resampled, so duration changes and pitch does not.
+# Works on short buffers (a few live frames) where an STFT would not fit.
+
+
+def wsola(y: np.ndarray, length: int, sr: int, window_ms: float = WINDOW_MS) -> np.ndarray:
+    """Time-scale `y` to `length` samples without changing its pitch."""
+    y = np.asarray(y, dtype=np.float32)
+    win = max(int(sr * window_ms / 1000.0) // 2 * 2, 4)
+    hop = win // 2
+    tol = hop // 2
+    if length <= 0:
+        return np.zeros(0, dtype=np.float32)
+    if len(y) < win or length < win:
+        # Too short to find grains: keep the head, trimmed or padded to length
+        out = np.zeros(length, dtype=np.float32)
+        out[:min(length, len(y))] = y[:length]
+        return out
+
+    rate = len(y) / length
+    window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(win) / win)).astype(np.float32)  # sums to 1 at hop
+    n_grains = -(-length // hop) + 1
+    padded = np.pad(y, (tol, win + 2 * tol + hop + int(np.ceil(rate * hop))))
+
+    out = np.zeros(n_grains * hop + win, dtype=np.float32)
+    weight = np.zeros_like(out)
+    prev = 0
+    for k in range(n_grains):
+        nominal = int(round(k * hop * rate))
+        if k == 0:
+            pos = 0
+        else:
+            # Best match for the natural continuation of the previous grain
+            target = padded[tol + prev + hop:tol + prev + hop + win]
+            region = padded[nominal:nominal + win + 2 * tol]
+            pos = nominal - tol + int(np.argmax(np.correlate(region, target, mode="valid")))
+        out[k * hop:k * hop + win] += padded[tol + pos:tol + pos + win] * window
+        weight[k * hop:k * hop + win] += window
+        prev = pos
+
+    # Normalise where fewer than two grains overlap (the first half window)
+    out = out[:length]
+    weight = weight[:length]
+    return np.where(weight > 1e-3, out / np.maximum(weight, 1e-3), 0.0).astype(np.float32)
@@ -0,0 +1,238 @@
+# audio_engine/pipeline.py
+
+import threading
+
+import numpy as np
+import librosa
+from pedalboard import Pedalboard, PitchShift
+from scipy.signal import lfilter
+
+from audio_engine.effects.autotune import autotune_chunk, scale_frequencies
+from audio_engine.effects.clarity import highpass_coeffs, DEFAULT_CUTOFF
+from audio_engine.effects.denoise import spectral_gate, noise_profile
+from audio_engine.effects.meme_filter import get_effect
+from audio_engine.effects.pitch_shift import PitchShifter
+from audio_engine.analysis import N_FFT, HOP_LENGTH
+from audio_engine.resample import varispeed
+from audio_engine import vad
+
+# ────────────────────────────────────────────────────────
+# ARRAY-BASED EFFECT CHAIN
+#
+# A chain is an ordered list of (stage, params).  Each stage is compiled
+# once per sample rate into:
+#   block(ctx) – reads ctx.y, float32 audio shaped (n,) or (clips, n), and
+#               returns the new signal; stacked input lets vectorizable
+#               stages handle a group of clips in one call.  Spectral stages
+#               pull STFT / energy / f0 from the AnalysisContext so one
+#               transform serves every stage until the signal changes
+#   stream()  – factory for a stateful per-connection chunk processor,
+#               or None when the stage cannot run live
+#   latency   – seconds a stream holds audio back before it comes out
+#
+# Compiled stages are immutable and shared (see audio_engine/presets.py);
+# anything that carries state between chunks lives in the stream closure.
+
+MIN_STRETCH_LEN = 2048
+CLEAN_NOISE_FLOOR_DB = -60.0   # denoise skips input quieter than this between words
+MIN_VOICED_RATIO = 0.1         # autotune skips input with less voiced speech than this
+NOISE_SAMPLE_SECONDS = 2.0     # gated-out audio used for the denoise noise profile
+
+
+def _speech_spans(ctx):
+    """Speech ranges when VAD can save work on this context, else None (process everything)."""
+    if not ctx.vad or ctx.y.ndim != 1:
+        return None
+    spans = ctx.speech_spans()
+    return spans if vad.is_partial(spans, ctx.y.shape[-1]) else None
+
+
+def _all_clips(features, test) -> bool:
+    """True when ingest features exist and every clip in the context passes `test`."""
+    if not features:
+        return False
+    rows = features if isinstance(features, list) else [features]
+    return all(test(f) for f in rows)
+
+
+class Stage:
+    def __init__(self, name, block, stream=None, latency=0.0):
+        self.name = name
+        self.block = block
+        self.stream = stream
+        self.latency = latency
+
+
+def _compile_time_stretch(sr, rate=1.0):
+    def stretch(y, D=None):
+        # Same as librosa.effects.time_stretch, minus its private STFT
+        D = librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH) if D is None else D
+        D = librosa.phase_vocoder(D, rate=rate, hop_length=HOP_LENGTH)
+        return librosa.istft(D, hop_length=HOP_LENGTH, n_fft=N_FFT,
+                             length=int(round(y.shape[-1] / rate)), dtype=np.float32)
+
+    def resize(y):
+        # Silence only needs the right length; resampling is enough
+        n = int(round(len(y) / rate))
+        return librosa.util.fix_length(varispeed(y, rate), size=n) if len(y) > 1 else np.zeros(n, np.float32)
+
+    def block(ctx):
+        n = ctx.y.shape[-1]
+        if n <= MIN_STRETCH_LEN:
+            print("[WARN] Clip too short for time-stretching.")
+            return ctx.y
+        spans = _speech_spans(ctx)
+        if spans is not None:
+            out = vad.join_segments(ctx.y, spans,
+                                    lambda seg: stretch(seg) if len(seg) > MIN_STRETCH_LEN else resize(seg),
+                                    resize)
+            return librosa.util.fix_length(out, size=int(round(n / rate)))
+        return stretch(ctx.y, ctx.stft())
+
+    # Live output has to keep pace with input, so speed is not applied per frame
+    return Stage("time_stretch", block)
+
+
+def _compile_pitch(sr, semitones=0):
+    shared = Pedalboard([PitchShift(semitones=semitones)])
+    lock = threading.Lock()  # plugin instances are not safe to use from two threads at once
+
+    def block(ctx):
+        y = ctx.y
+        # Pedalboard treats rows as channels, so a stack is shifted in one pass
+        with lock:
+            out = shared.process(np.atleast_2d(y).astype(np.float32), sr)
+        return out if y.ndim > 1 else out[0]
+
+    def stream():
+        # Pedalboard's PitchShift only returns silence when fed frame by frame
+        # (reset=False), so live frames go through the delay-line shifter
+        return PitchShifter(sr, semitones).process
+
+    return Stage("pitch", block, stream, latency=PitchShifter(sr, semitones).latency)
+
+
+def _compile_clarity(sr, cutoff=DEFAULT_CUTOFF):
+    b, a = highpass_coeffs(cutoff, sr)
+
+    def block(ctx):
+        return librosa.util.normalize(lfilter(b, a, ctx.y, axis=-1), axis=-1)
+
+    def stream():
+        zi = np.zeros(max(len(a), len(b)) - 1)
+
+        def process(chunk):
+            nonlocal zi
+            y_hp, zi = lfilter(b, a, chunk, zi=zi)
+            return librosa.util.normalize(y_hp)
+        return process
+
+    return Stage("clarity", block, stream)
+
+
+def _compile_denoise(sr):
+    def block(ctx):
+        if _all_clips(ctx.features, lambda f: f["noise_floor_db"] < CLEAN_NOISE_FLOOR_DB):
+            return ctx.y
+        spans = _speech_spans(ctx)
+        if spans is not None:
+            # Gate speech against a profile of the gated-out audio; attenuate the rest
+            limit = int(NOISE_SAMPLE_SECONDS * sr)
+            silence = np.concatenate([ctx.y[s:e] for s, e, is_speech in vad.segments(ctx.y.shape[-1], spans)
+                                      if not is_speech])[:limit]
+            noise = noise_profile(librosa.stft(silence, n_fft=N_FFT, hop_length=HOP_LENGTH))
+
+            def gate(seg):
+                D = spectral_gate(librosa.stft(seg, n_fft=N_FFT, hop_length=HOP_LENGTH), noise=noise)
+                return librosa.istft(D, hop_length=HOP_LENGTH, n_fft=N_FFT, length=len(seg), dtype=np.float32)
+            return vad.apply_on_speech(ctx.y, spans, gate)
+
+        D = spectral_gate(ctx.stft(), ctx.frame_energy(), valid=ctx.valid_frames())
+        return librosa.istft(D, hop_length=HOP_LENGTH, n_fft=N_FFT,
+                             length=ctx.y.shape[-1], dtype=np.float32)
+
+    def stream():
+        def process(chunk):
+            # Percentile noise gate, same as remove_noise_chunk
+            peak = np.max(np.abs(chunk), initial=0.0)
+            if peak == 0:
+                return chunk
+            chunk = chunk / peak
+            noise_floor = np.percentile(np.abs(chunk), 10)
+            return np.where(np.abs(chunk) < noise_floor, 0.0, chunk)
+        return process
+
+    return Stage("denoise", block, stream)
+
+
+def _compile_autotune(sr, scale="C"):
+    scale_frequencies(scale)  # warm the table
+
+    def block(ctx):
+        if _all_clips(ctx.features, lambda f: f["voiced_ratio"] < MIN_VOICED_RATIO):
+            return ctx.y
+        y, (f0, _, _) = ctx.y, ctx.f0()
+        # rubberband works clip by clip; pyin ran once for the whole stack
+        if y.ndim == 1:
+            return autotune_chunk(y, sr, scale, f0)
+        return np.stack([librosa.util.fix_length(autotune_chunk(row, sr, scale, row_f0), size=y.shape[-1])
+                         for row, row_f0 in zip(y, f0)])
+
+    return Stage("autotune", block)
+
+
+def _compile_fun(sr, effect):
+    cls = get_effect(effect)
+    # Effects are stateful, so block gets a fresh instance per call
+    return Stage("fun", lambda ctx: cls.block(ctx.y, sr), lambda: cls(sr).process, latency=cls.latency)
+
+
+STAGES = {
+    "time_stretch": _compile_time_stretch,
+    "pitch": _compile_pitch,
+    "clarity": _compile_clarity,
+    "denoise": _compile_denoise,
+    "autotune": _compile_autotune,
+    "fun": _compile_fun,
+}
+
+
+def compile_stage(name: str, sr: int, params: dict) -> Stage:
+    if name not in STAGES:
+        raise ValueError(f"Unknown stage '{name}'. Choose from {list(STAGES)}.")
+    return STAGES[name](sr, **params)
+
+
+def build_chain(pitch_shift: int = 0, time_stretch: float = 1.0, clarity: bool = False,
+                denoise: bool = False, autotune: bool = False, effect: str = "") -> list[tuple[str, dict]]:
+    """Translate upload form options into an ordered list of (stage, params)."""
+    chain = []
+    if time_stretch != 1.0:
+        chain.append(("time_stretch", {"rate": time_stretch}))
+    if pitch_shift != 0:
+        chain.append(("pitch", {"semitones": pitch_shift}))
+    if clarity:
+        chain.append(("clarity", {}))
+    if denoise:
+        chain.append(("denoise", {}))
+    if autotune:
+        chain.append(("autotune", {}))
+    if effect:
+        get_effect(effect)  # fail on unknown names before anything is compiled
+        chain.append(("fun", {"effect": effect}))
+    return chain
+
+
+def describe_chain(pitch_shift: int = 0, time_stretch: float = 1.0, clarity: bool = False,
+                   denoise: bool = False, style: str = "", effect: str = "") -> list[str]:
+    """Filter labels in the format stored on TransformationLog."""
+    labels = [
+        f"pitch:{pitch_shift}",
+        f"speed:{time_stretch}",
+        f"clarity:{clarity}",
+        f"denoise:{denoise}",
+        f"style:{style or 'none'}"
+    ]
+    if effect:
+        labels.append(f"fun:{effect}")
+    return labels
@@ -0,0 +1,187 @@
+# audio_engine/presets.py
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+
+import numpy as np
+
+from audio_engine.analysis import AnalysisContext
+from audio_engine.pipeline import build_chain, compile_stage
+from audio_engine.stage_cache import input_key, prefix_keys
+from config import WORKING_SR
+
+# ────────────────────────────────────────────────────────
+# NAMED PRESETS  (stage order matters)
+PRESETS = {
+    "podcast": [("clarity", {}), ("denoise", {})],
+    "chipmunk": [("pitch", {"semitones": 8})],
+    "deep": [("pitch", {"semitones": -5}), ("clarity", {})],
+    "fast_talk": [("time_stretch", {"rate": 1.25}), ("clarity", {})],
+    "studio": [("denoise", {}), ("clarity", {}), ("autotune", {})],
+    "robot": [("fun", {"effect": "robot"})],
+    "alien": [("fun", {"effect": "alien"})],
+}
+
+POOL_SIZE = 64
+PROFILE_WARMUP = 4      # frames run before timing, so plugins and caches settle
+PROFILE_FRAMES = 16     # frames per timed run
+PROFILE_RUNS = 3        # the fastest run counts; slower ones met a busy CPU
+PROFILE_TTL_S = 300.0   # re-measure after this long, as load and clocks drift
+
+
+def chain_key(chain) -> tuple:
+    """Hashable, order-preserving identity of a chain."""
+    return tuple((name, tuple(sorted(params.items()))) for name, params in chain)
+
+
+def resolve_chain(preset: str = "", **options) -> list[tuple[str, dict]]:
+    """A named preset if given, otherwise the chain described by the form options."""
+    if preset:
+        if preset not in PRESETS:
+            raise ValueError(f"Unknown preset '{preset}'. Choose from {list(PRESETS)}.")
+        return PRESETS[preset]
+    return build_chain(**options)
+
+
+# ────────────────────────────────────────────────────────
+# COMPILED PROCESSORS
+
+class CompiledPreset:
+    """
+    An effect chain compiled for one sample rate.
+    Stateless and shared; call stream() for per-connection live state.
+    """
+
+    def __init__(self, chain, sr: int = WORKING_SR):
+        self.key = chain_key(chain)
+        self.sr = sr
+        self.stages = [compile_stage(name, sr, params) for name, params in chain]
+        self._profiles = {}     # frame size -> (measured at, stream_profile())
+        self._profile_lock = threading.Lock()
+
+    @property
+    def names(self) -> list[str]:
+        return [s.name for s in self.stages]
+
+    @property
+    def stream_latency(self) -> float:
+        """Seconds the live form of this chain holds audio back."""
+        return sum(s.latency for s in self.stages if s.stream is not None)
+
+    def stream_profile(self, frame: int) -> list[dict]:
+        """
+        Per-stage cost of the live chain at this frame size: ms of compute
+        per frame (timed on a synthetic voiced signal) and ms of audio the
+        stage holds back.  Cached per frame size for PROFILE_TTL_S, as pooled
+        instances are shared by every session; callers come from worker
+        threads, so one measures while the others wait for its result.
+        """
+        with self._profile_lock:
+            cached = self._profiles.get(frame)
+            if cached is None or time.monotonic() - cached[0] > PROFILE_TTL_S:
+                cached = self._profiles[frame] = (time.monotonic(), self._measure(frame))
+            return cached[1]
+
+    def _measure(self, frame: int) -> list[dict]:
+        n = frame * (PROFILE_WARMUP + PROFILE_FRAMES)
+        t = np.arange(n) / self.sr
+        noise = np.random.default_rng(0).standard_normal(n)
+        frames = (0.3 * np.sin(2 * np.pi * 150 * t) + 0.01 * noise).astype(np.float32).reshape(-1, frame)
+
+        profile = []
+        for stage in self.stages:
+            if stage.stream is None:
+                profile.append({"name": stage.name, "live": False})
+                continue
+            fn = stage.stream()
+            for chunk in frames[:PROFILE_WARMUP]:
+                fn(chunk)
+            best = float("inf")
+            for _ in range(PROFILE_RUNS):
+                start = time.perf_counter()
+                for chunk in frames[PROFILE_WARMUP:]:
+                    fn(chunk)
+                best = min(best, time.perf_counter() - start)
+            profile.append({
+                "name": stage.name,
+                "live": True,
+                "latency_ms": round(stage.latency * 1000.0, 2),
+                "process_ms": round(best / PROFILE_FRAMES * 1000.0, 3),
+            })
+        return profile
+
+    def process(self, y: np.ndarray) -> np.ndarray:
+        """Run the whole chain on one clip (n,) or a stack of clips (clips, n)."""
+        return self.run(AnalysisContext(y, self.sr)).y
+
+    def run(self, ctx: AnalysisContext, meter=None, cache=None) -> AnalysisContext:
+        """
+        Run the chain against a caller-owned context, so analyses computed
+        here (or before) stay available afterwards, e.g. for spectrograms.
+        `meter` (services.memory_budget.MemoryMeter) records peak RSS per stage.
+        `cache` (audio_engine.stage_cache.StageCache) stores every stage's
+        output and resumes from the longest chain prefix already rendered.
+        """
+        start, keys = 0, []
+        if cache is not None and self.stages:
+            # Features, fast mode and VAD change what stages do, so they are part of the input
+            base = input_key(ctx.y, self.sr, ctx.fast, ctx.vad, ctx.features is not None)
+            keys = prefix_keys(base, self.key)
+            for i in range(len(keys), 0, -1):
+                hit = cache.get(keys[i - 1])
+                if hit is not None:
+                    ctx.update(hit)
+                    start = i
+                    break
+
+        for i in range(start, len(self.stages)):
+            stage = self.stages[i]
+            with meter.stage(stage.name) if meter else nullcontext():
+                ctx.update(stage.block(ctx))
+            if keys:
+                cache.put(keys[i], ctx.y)
+        return ctx
+
+    def stream(self):
+        """Fresh chunk processor with its own filter / plugin state."""
+        live = []
+        for stage in self.stages:
+            if stage.stream is None:
+                print(f"[Preset] Stage '{stage.name}' has no live mode, skipping")
+                continue
+            live.append(stage.stream())
+
+        def process(chunk):
+            chunk = np.asarray(chunk, dtype=np.float32)
+            for fn in live:
+                chunk = np.asarray(fn(chunk), dtype=np.float32)
+            return chunk
+        return process
+
+
+_pool = OrderedDict()
+_pool_lock = threading.Lock()
+
+
+def get_processor(chain, sr: int = WORKING_SR) -> CompiledPreset:
+    """Compiled chain from the shared pool, built on first use (LRU bounded)."""
+    key = (chain_key(chain), sr)
+    with _pool_lock:
+        proc = _pool.get(key)
+        if proc is not None:
+            _pool.move_to_end(key)
+            return proc
+
+    proc = CompiledPreset(chain, sr)
+    with _pool_lock:
+        proc = _pool.setdefault(key, proc)
+        _pool.move_to_end(key)
+        while len(_pool) > POOL_SIZE:
+            _pool.popitem(last=False)
+    return proc
+
+
+def get_preset(name: str, sr: int = WORKING_SR) -> CompiledPreset:
+    return get_processor(resolve_chain(name), sr)
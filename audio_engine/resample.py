@@ -0,0 +1,146 @@
+# audio_engine/resample.py
+
+from fractions import Fraction
+from functools import lru_cache
+from math import gcd
+
+import librosa
+import numpy as np
+from scipy.signal import firwin, resample_poly, upfirdn
+
+from config import WORKING_SR
+
+# ────────────────────────────────────────────────────────
+# CONFIG
+HALF_TAPS = 10                # taps per side, per polyphase branch
+KAISER_BETA = 5.0
+MAX_VARISPEED_DENOM = 64      # keeps varispeed kernels short
+
+
+# ────────────────────────────────────────────────────────
+# KERNELS
+
+def _ratio(sr_in: int, sr_out: int) -> tuple[int, int]:
+    """Reduce sr_out / sr_in to the (up, down) pair used by the polyphase filter."""
+    g = gcd(int(sr_in), int(sr_out))
+    return int(sr_out) // g, int(sr_in) // g
+
+
+@lru_cache(maxsize=32)
+def _kernel(up: int, down: int) -> np.ndarray:
+    """Anti-aliasing low-pass FIR for an up/down pair (designed once per ratio)."""
+    max_rate = max(up, down)
+    taps = firwin(2 * HALF_TAPS * max_rate + 1, 1.0 / max_rate,
+                  window=("kaiser", KAISER_BETA))
+    taps.setflags(write=False)
+    return taps
+
+
+# ────────────────────────────────────────────────────────
+# BLOCK VERSION
+
+def resample(y: np.ndarray, sr_in: int, sr_out: int = WORKING_SR) -> np.ndarray:
+    """
+    Polyphase resample along the last axis.
+    Returns float32; a no-op when the rates already match.
+    """
+    if int(sr_in) == int(sr_out):
+        return np.asarray(y, dtype=np.float32)
+
+    up, down = _ratio(sr_in, sr_out)
+    # resample_poly copies the window array before scaling it, so the cache stays intact
+    y_out = resample_poly(y, up, down, axis=-1, window=_kernel(up, down))
+    return y_out.astype(np.float32, copy=False)
+
+
+def varispeed(y: np.ndarray, factor: float) -> np.ndarray:
+    """
+    Tape-style speed change: factor > 1 plays faster and higher.
+    The ratio is rounded to a small fraction so the kernel stays cheap.
+    """
+    if factor <= 0:
+        raise ValueError("factor must be positive")
+    ratio = Fraction(factor).limit_denominator(MAX_VARISPEED_DENOM)
+    if ratio == 1:
+        return np.asarray(y, dtype=np.float32)
+    return resample(y, ratio.numerator, ratio.denominator)
+
+
+def load_audio(path: str, sr: int = WORKING_SR, mono: bool = True,
+               offset: float = 0.0, duration: float | None = None) -> tuple[np.ndarray, int]:
+    """
+    Ingest helper: decode at the native rate, then resample exactly once to `sr`.
+    Every pipeline should enter through here so later stages can trust the rate.
+    """
+    y, native_sr = librosa.load(path, sr=None, mono=mono,
+                                offset=offset, duration=duration)
+    return resample(y, native_sr, sr), sr
+
+
+# ────────────────────────────────────────────────────────
+# STREAMING VERSION
+
+class StreamingResampler:
+    """
+    Stateful polyphase resampler for the live path.
+
+    Keeps just enough input history between calls to continue the filter
+    exactly where the previous chunk stopped, so chunk boundaries are
+    seamless.  Output lags input by `delay` samples (the FIR group delay).
+    """
+
+    def __init__(self, sr_in: int, sr_out: int = WORKING_SR):
+        self.sr_in = int(sr_in)
+        self.sr_out = int(sr_out)
+        self.up, self.down = _ratio(self.sr_in, self.sr_out)
+        self._h = np.ones(1) if self.passthrough else _kernel(self.up, self.down) * self.up
+        self._buf = np.zeros(0, dtype=np.float32)
+        self._buf_start = 0       # absolute input index of _buf[0]
+        self._next_out = 0        # absolute index of the next output sample
+
+    @property
+    def passthrough(self) -> bool:
+        return self.up == self.down
+
+    @property
+    def delay(self) -> int:
+        """Group delay in output samples."""
+        return 0 if self.passthrough else (len(self._h) - 1) // 2 // self.down
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        chunk = np.asarray(chunk, dtype=np.float32)
+        if self.passthrough:
+            return chunk
+
+        self._buf = np.concatenate([self._buf, chunk])
+        total_in = self._buf_start + len(self._buf)
+        if total_in == 0:
+            return np.zeros(0, dtype=np.float32)
+
+        # The filter is causal: output m only needs inputs up to m*down/up
+        out_end = (total_in - 1) * self.up // self.down + 1
+        # _buf_start is kept a multiple of `down`, so upfirdn's output grid lines up
+        base = self._buf_start * self.up // self.down
+        y = upfirdn(self._h, self._buf, self.up, self.down)
+        out = y[self._next_out - base:out_end - base].astype(np.float32)
+        self._next_out = out_end
+
+        # Drop history no future output can reach
+        need = max(0, -(-(self._next_out * self.down - (len(self._h) - 1)) // self.up))
+        new_start = (need // self.down) * self.down
+        if new_start > self._buf_start:
+            self._buf = self._buf[new_start - self._buf_start:]
+            self._buf_start = new_start
+        return out
+
+    def flush(self) -> np.ndarray:
+        """Push zeros through the filter to drain the samples still in flight."""
+        if self.passthrough:
+            return np.zeros(0, dtype=np.float32)
+        tail = -(-len(self._h) // self.up)
+        return self.process(np.zeros(tail, dtype=np.float32))
+
+    def reset(self):
+        self._buf = np.zeros(0, dtype=np.float32)
+        self._buf_start = 0
+        self._next_out = 0
@@ -0,0 +1,155 @@
+# audio_engine/stage_cache.py
+
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from config import STAGE_CACHE_MEMORY_MB, STAGE_CACHE_DISK_MB
+
+CACHE_DIR = Path("data/stage_cache")
+MB = 1024 * 1024
+
+# ────────────────────────────────────────────────────────
+# STAGE MEMOIZATION
+#
+# Every intermediate buffer of a chain is stored under
+#     key_0 = hash(input samples, rate, analysis mode)
+#     key_i = hash(key_{i-1}, stage i name + params)
+# so one key names "this input after these stages, in this order".  A
+# re-render walks the keys from the longest prefix down and resumes from
+# the first hit; changing the last option only pays for the last stage.
+#
+# Two bounded LRU tiers: a memory tier for the active editing session and
+# a disk tier (.npy files, evicted by mtime) that survives restarts and is
+# shared with worker processes.  Stored arrays are read-only, so a caller
+# cannot corrupt a cached buffer in place.
+
+
+def input_key(y: np.ndarray, sr: int, *salt) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.ascontiguousarray(y, dtype=np.float32).tobytes())
+    h.update(repr((sr, y.shape, salt)).encode())
+    return h.hexdigest()
+
+
+def prefix_keys(base: str, stage_specs) -> list[str]:
+    """One key per stage: key i identifies the output after stages 0..i."""
+    keys, key = [], base
+    for spec in stage_specs:
+        key = hashlib.blake2b(f"{key}|{spec!r}".encode(), digest_size=16).hexdigest()
+        keys.append(key)
+    return keys
+
+
+class StageCache:
+    def __init__(self, memory_bytes: int, disk_bytes: int, directory: Path = CACHE_DIR):
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.directory = directory
+        self._memory = OrderedDict()
+        self._memory_used = 0
+        self._disk_used = None      # scanned on first disk write
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.npy"
+
+    # ── Lookup ──
+    def get(self, key: str) -> np.ndarray | None:
+        with self._lock:
+            y = self._memory.get(key)
+            if y is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return y
+        try:
+            y = np.load(self._path(key))
+            os.utime(self._path(key))  # LRU order on disk is mtime
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        y.setflags(write=False)
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, y)
+        return y
+
+    def get_or_put(self, key: str, compute) -> np.ndarray:
+        y = self.get(key)
+        if y is None:
+            y = compute()
+            self.put(key, y)
+        return y
+
+    # ── Store ──
+    def put(self, key: str, y: np.ndarray):
+        y = np.asarray(y)
+        y.setflags(write=False)
+        with self._lock:
+            self._remember(key, y)
+        if self.disk_bytes > 0 and y.nbytes <= self.disk_bytes:
+            self._write_disk(key, y)
+
+    def _remember(self, key: str, y: np.ndarray):
+        if y.nbytes > self.memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_used -= old.nbytes
+        self._memory[key] = y
+        self._memory_used += y.nbytes
+        while self._memory_used > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_used -= evicted.nbytes
+
+    def _write_disk(self, key: str, y: np.ndarray):
+        path = self._path(key)
+        if path.exists():
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = self.directory / f"{key}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, y)
+        os.replace(tmp, path)
+
+        with self._lock:
+            if self._disk_used is None:
+                self._disk_used = sum(p.stat().st_size for p in self.directory.glob("*.npy"))
+            else:
+                self._disk_used += path.stat().st_size
+            if self._disk_used <= self.disk_bytes:
+                return
+            # Oldest first until back under the bound
+            files = sorted(self.directory.glob("*.npy"), key=lambda p: p.stat().st_mtime)
+            for old in files:
+                if self._disk_used <= self.disk_bytes:
+                    break
+                try:
+                    size = old.stat().st_size
+                    old.unlink()
+                    self._disk_used -= size
+                except OSError:
+                    pass
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "memory_entries": len(self._memory),
+                "memory_mb": round(self._memory_used / MB, 1),
+                "disk_mb": round((self._disk_used or 0) / MB, 1),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+
+STAGE_CACHE = StageCache(STAGE_CACHE_MEMORY_MB * MB, STAGE_CACHE_DISK_MB * MB)
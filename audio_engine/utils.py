@@ -4,12 +4,18 @@ import numpy as np
 import librosa
 import librosa.display
 
+from audio_engine.analysis import AnalysisContext, HOP_LENGTH
+from audio_engine.resample import load_audio
 
-def generate_spectrogram(audio_path: str, output_path: str, title: str = "Spectrogram"):
-    y, sr = librosa.load(audio_path)
+
+def generate_spectrogram(audio_path: str, output_path: str, title: str = "Spectrogram",
+                         ctx: AnalysisContext | None = None):
+    """Pass the request's AnalysisContext to reuse its STFT instead of reloading the file."""
+    if ctx is None:
+        ctx = AnalysisContext(*load_audio(audio_path))
     plt.figure(figsize=(10, 4))
-    D = librosa.amplitude_to_db(np.abs(librosa.stft(y)), ref=np.max)
-    librosa.display.specshow(D, sr=sr, x_axis='time', y_axis='log')
+    D = librosa.amplitude_to_db(ctx.magnitude(), ref=np.max)
+    librosa.display.specshow(D, sr=ctx.sr, hop_length=HOP_LENGTH, x_axis='time', y_axis='log')
     plt.colorbar(format='%+2.0f dB')
     plt.title(title)
     plt.tight_layout()
@@ -18,7 +24,7 @@ def generate_spectrogram(audio_path: str, output_path: str, title: str = "Spectr
 
 
 def generate_waveform(audio_path: str, output_path: str, title: str = "Waveform"):
-    y, sr = librosa.load(audio_path)
+    y, sr = load_audio(audio_path)
     plt.figure(figsize=(10, 3))
     librosa.display.waveshow(y, sr=sr)
     plt.title(title)
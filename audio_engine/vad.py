@@ -0,0 +1,166 @@
+# audio_engine/vad.py
+
+import numpy as np
+import librosa
+from scipy.ndimage import maximum_filter1d, minimum_filter1d
+
+# ────────────────────────────────────────────────────────
+# CONFIG
+VAD_N_FFT = 512             # small transform: the decision needs levels, not resolution
+ENERGY_MARGIN_DB = 10.0     # speech sits this far above the noise floor...
+FLATNESS_MAX = 0.3          # ...and is tonal (noise is spectrally flat)
+SILENCE_DB = -60.0          # below this (dBFS) a frame is never speech
+NOISE_PERCENTILE = 10
+HANGOVER_MS = 200.0         # keep the gate open after speech (and pre-roll before it)
+MIN_SPEECH_MS = 60.0        # shorter bursts are clicks, not speech
+SILENCE_GAIN = 0.1          # cheap treatment for gated-out regions (-20 dB)
+FADE = 256                  # samples of crossfade where processed and gated regions meet
+
+EPS = 1e-10
+
+# ────────────────────────────────────────────────────────
+# OFFLINE
+#
+# frame_speech() marks speech frames on a centred frame grid; called with
+# the pipeline's hop (AnalysisContext.speech_mask) masks line up with the
+# cached STFT and pyin.
+# speech_spans() turns a mask into hop-aligned sample ranges, and the two
+# splice helpers run an expensive function on those ranges only.
+
+
+def _flatness(S: np.ndarray) -> np.ndarray:
+    """Spectral flatness per frame: ~1 for noise, near 0 for voiced sound."""
+    return np.exp(np.mean(np.log(S + EPS), axis=-2)) / (np.mean(S, axis=-2) + EPS)
+
+
+def _db(rms):
+    return 20.0 * np.log10(np.maximum(rms, EPS))
+
+
+def frame_speech(y: np.ndarray, sr: int, hop_length: int) -> np.ndarray:
+    """Boolean speech mask, shaped (..., frames)."""
+    db = _db(librosa.feature.rms(y=y, frame_length=VAD_N_FFT, hop_length=hop_length)[..., 0, :])
+    flatness = _flatness(np.abs(librosa.stft(y, n_fft=VAD_N_FFT, hop_length=hop_length)))
+    floor = np.percentile(db, NOISE_PERCENTILE, axis=-1, keepdims=True)
+
+    # Loud frames count even when flat, so fricatives are not cut
+    speech = (db > floor + ENERGY_MARGIN_DB) & ((flatness < FLATNESS_MAX) | (db > floor + 2 * ENERGY_MARGIN_DB))
+    speech &= db > SILENCE_DB
+
+    min_frames = max(int(MIN_SPEECH_MS / 1000.0 * sr / hop_length), 1)
+    hangover = max(int(HANGOVER_MS / 1000.0 * sr / hop_length), 0)
+    speech = maximum_filter1d(minimum_filter1d(speech, min_frames, axis=-1), min_frames, axis=-1)
+    return maximum_filter1d(speech, 2 * hangover + 1, axis=-1)
+
+
+def speech_spans(mask: np.ndarray, n: int, hop_length: int) -> list[tuple[int, int]]:
+    """Sample ranges [start, end) of the speech runs in a 1-D frame mask."""
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], mask.astype(np.int8), [0]])))
+    return [(int(a) * hop_length, min(int(b) * hop_length, n)) for a, b in zip(edges[::2], edges[1::2])
+            if int(a) * hop_length < n]
+
+
+def segments(n: int, spans) -> list[tuple[int, int, bool]]:
+    """Cover [0, n) with alternating (start, end, is_speech) pieces."""
+    out, pos = [], 0
+    for s, e in spans:
+        if s > pos:
+            out.append((pos, s, False))
+        out.append((s, e, True))
+        pos = e
+    if pos < n:
+        out.append((pos, n, False))
+    return out
+
+
+def apply_on_speech(y: np.ndarray, spans, fn, silence_gain: float = SILENCE_GAIN) -> np.ndarray:
+    """
+    Length-preserving: `fn(segment)` on speech spans, a flat gain elsewhere,
+    with short crossfades so the joins do not click.
+    """
+    gated = (y * silence_gain).astype(np.float32)
+    out = gated.copy()
+    for s, e in spans:
+        seg = np.asarray(fn(y[s:e]), dtype=np.float32)
+        out[s:e] = seg
+        fade = min(FADE, (e - s) // 2)
+        if fade:
+            ramp = np.linspace(0.0, 1.0, fade, dtype=np.float32)
+            if s > 0:
+                out[s:s + fade] = ramp * seg[:fade] + (1 - ramp) * gated[s:s + fade]
+            if e < len(y):
+                out[e - fade:e] = ramp[::-1] * seg[-fade:] + ramp * gated[e - fade:e]
+    return out
+
+
+def join_segments(y: np.ndarray, spans, speech_fn, silence_fn, fade: int = FADE) -> np.ndarray:
+    """
+    Length-changing: each piece goes through the matching function and the
+    results are joined.  Every piece but the last also takes the first
+    `fade` samples of the next one, and that overlap is crossfaded into the
+    next piece's start so the joins do not click.
+    """
+    out = np.zeros(0, dtype=np.float32)
+    tail = 0        # samples at the end of `out` that overlap the next piece
+    for s, e, is_speech in segments(len(y), spans):
+        end = min(e + fade, len(y))
+        piece = np.asarray((speech_fn if is_speech else silence_fn)(y[s:end]), dtype=np.float32)
+        at, k = len(out) - tail, min(tail, len(piece))
+        if k:
+            ramp = np.linspace(0.0, 1.0, k, dtype=np.float32)
+            out[at:at + k] = (1 - ramp) * out[at:at + k] + ramp * piece[:k]
+        out = np.concatenate([out[:at + k], piece[k:]])
+        tail = int(round((end - e) * len(piece) / max(end - s, 1)))
+    return out
+
+
+def is_partial(spans, n: int) -> bool:
+    """Worth splitting: some speech, and not all of it."""
+    return bool(spans) and spans != [(0, n)]
+
+
+# ────────────────────────────────────────────────────────
+# STREAMING
+#
+# Per-chunk gate for the live path.  The noise floor drops to any quieter
+# chunk immediately and creeps up slowly, so it follows room noise without
+# being pulled up by speech.  Hangover keeps the gate open long enough for
+# stateful effects to play out what they have buffered.
+
+INITIAL_FLOOR_DB = -60.0
+FLOOR_RISE_DB_PER_S = 3.0
+
+
+class StreamingVAD:
+    def __init__(self, sr: int, hangover: float = HANGOVER_MS / 1000.0):
+        self.sr = sr
+        self.hangover = int(hangover * sr)
+        self._window = np.zeros(0)     # Hann window for the last chunk size; frames rarely change size
+        self.reset()
+
+    def reset(self):
+        self.floor_db = INITIAL_FLOOR_DB
+        self._open_for = 0      # samples of hangover left
+        self.gated = 0          # chunks judged silent
+
+    def is_speech(self, chunk: np.ndarray) -> bool:
+        n = len(chunk)
+        if n == 0:
+            return self._open_for > 0
+        if len(self._window) != n:
+            self._window = np.hanning(n).astype(np.float32)
+        db = float(_db(np.sqrt(np.dot(chunk, chunk) / n)))
+        flatness = float(_flatness(np.abs(np.fft.rfft(chunk * self._window))[:, np.newaxis])[0])
+
+        speech = (db > SILENCE_DB and db > self.floor_db + ENERGY_MARGIN_DB
+                  and (flatness < FLATNESS_MAX or db > self.floor_db + 2 * ENERGY_MARGIN_DB))
+        self.floor_db = min(db, self.floor_db + FLOOR_RISE_DB_PER_S * n / self.sr)
+
+        if speech:
+            self._open_for = self.hangover
+            return True
+        if self._open_for > 0:
+            self._open_for -= n
+            return True
+        self.gated += 1
+        return False
@@ -1,4 +1,33 @@
-CHUNK = 1024
+import os
+
+# Canonical rate every pipeline works at after ingest (see audio_engine/resample.py)
+WORKING_SR = 16000
+
+# Live /ws/audio defaults; clients negotiate their own at connect time (see api/live_audio_ws.py)
+CHUNK = 2048            # samples per frame at the client rate
 FORMAT = 8  # pyaudio.paInt16
 CHANNELS = 1
-RATE = 44100
+RATE = WORKING_SR       # client capture rate
+MIN_CHUNK = 256
+MAX_CHUNK = 16384
+LIVE_RATES = (8000, 16000, 22050, 24000, 32000, 44100, 48000)   # rates the chain may run at
+REALTIME_HEADROOM = 0.5     # share of a frame period the effect chain may use
+
+# Voice-activity detection: expensive stages and live frames only process speech
+VAD_ENABLED = os.getenv("VAD_ENABLED", "1") != "0"
+# Live gating attenuates non-speech by -20 dB, an audible change, so clients opt in
+LIVE_VAD_ENABLED = os.getenv("LIVE_VAD_ENABLED", "0") != "0"
+
+# Preview renders (see api/routes.py): a short window at a reduced rate
+PREVIEW_SR = 8000
+PREVIEW_SECONDS = 8.0
+PREVIEW_MAX_SECONDS = 15.0
+
+# Memory admission control (see services/memory_budget.py)
+MEMORY_BUDGET_MB = int(os.getenv("MEMORY_BUDGET_MB", "1024"))   # transform working memory, not whole-process RSS
+ADMISSION_QUEUE = int(os.getenv("ADMISSION_QUEUE", "16"))      # requests allowed to wait for memory
+ADMISSION_TIMEOUT_S = float(os.getenv("ADMISSION_TIMEOUT_S", "60"))
+
+# Intermediate buffers kept for incremental re-renders (see audio_engine/stage_cache.py)
+STAGE_CACHE_MEMORY_MB = int(os.getenv("STAGE_CACHE_MEMORY_MB", "64"))
+STAGE_CACHE_DISK_MB = int(os.getenv("STAGE_CACHE_DISK_MB", "1024"))
@@ -1,6 +1,6 @@
 import sqlite3
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text
 from sqlalchemy.ext.declarative import declarative_base
 
 
@@ -40,4 +40,5 @@ class TransformationLog(Base):
     filters_applied = Column(String)  # ✅ was 'filters_used'
     style_prompt = Column(String, nullable=True)  # ✅ newly added
     duration = Column(Float)
-    user_id = Column(String, nullable=True)
\ No newline at end of file
+    user_id = Column(String, nullable=True)
+    features = Column(Text, nullable=True)  # JSON, see models/feature_extraction.py
\ No newline at end of file
@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine
+import json
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker
 from .models import Base, TransformationLog
 
@@ -10,16 +11,37 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Create tables if not exists
 Base.metadata.create_all(bind=engine)
 
-def log_transformation(file_name: str, filters_used: list, duration: float, user_id: str = None):
+# create_all never alters existing tables; add columns introduced later
+_ADDED_COLUMNS = {"features": "TEXT"}
+with engine.begin() as conn:
+    existing = {c["name"] for c in inspect(conn).get_columns(TransformationLog.__tablename__)}
+    for name, ddl in _ADDED_COLUMNS.items():
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE {TransformationLog.__tablename__} ADD COLUMN {name} {ddl}"))
+
+def log_transformation(file_name: str, filters_used: list, duration: float, user_id: str = None,
+                       features: dict = None):
+    log_transformations([
+        {"file_name": file_name, "filters_used": filters_used, "duration": duration,
+         "user_id": user_id, "features": features}
+    ])
+
+def log_transformations(entries: list):
+    """Write many transformation logs in a single session / commit (used by batch jobs)."""
+    if not entries:
+        return
     db = SessionLocal()
     try:
-        log = TransformationLog(
-            file_name=file_name,
-            filters_used=",".join(filters_used),
-            duration=duration,
-            user_id=user_id
-        )
-        db.add(log)
+        db.add_all([
+            TransformationLog(
+                file_name=e["file_name"],
+                filters_applied=",".join(e["filters_used"]),
+                duration=e["duration"],
+                user_id=e.get("user_id"),
+                features=json.dumps(e["features"]) if e.get("features") else None
+            )
+            for e in entries
+        ])
         db.commit()
     except Exception as e:
         db.rollback()
@@ -1,22 +1,22 @@
 # main.py
-import os
 import sys
 import shutil
-import tempfile
-import gc
 from pathlib import Path
 
-from fastapi import FastAPI, UploadFile, File, Form, WebSocket
+from fastapi import FastAPI, Query, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from starlette.websockets import WebSocketState
 from dotenv import load_dotenv
 from pydub import AudioSegment
 
 # Local imports
 from api.routes import router as audio_router
 from api.live_audio_ws import router as live_router
+from api.batch import router as batch_router
 from api import analyze as analytics
 from api import tts_api
+from config import WORKING_SR
+from services.live_recorder import LiveRecorder
 
 # === App Init ===
 app = FastAPI()
@@ -31,12 +31,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # let the player read result ids / validators for replay and seeking
+    expose_headers=["ETag", "Location", "X-Result-Id", "Content-Range", "Accept-Ranges",
+                    "X-Preview-Window", "X-Preview-Rate"],
 )
 
 # === Env Vars ===
 load_dotenv()
 
-# === FFMPEG Setup ===
+# === FFMPEG Setup (input conversion only; output is encoded in-process) ===
 AudioSegment.converter = shutil.which("ffmpeg")
 
 # === Temp Directory ===
@@ -45,6 +48,7 @@ TEMP_DIR.mkdir(exist_ok=True)
 
 # === Routers ===
 app.include_router(audio_router, prefix="/api")
+app.include_router(batch_router, prefix="/api")
 app.include_router(live_router)
 app.include_router(analytics.router, prefix="/api")
 app.include_router(tts_api.router, prefix="/api")
@@ -60,70 +64,26 @@ def read_root():
 # WebSocket: live mic input
 # =========================
 @app.websocket("/ws/live")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket, sr: int = Query(WORKING_SR)):
+    """Record raw int16 mic PCM; the finished file can be sent to /api/transform/recording/{id}."""
     await websocket.accept()
+    try:
+        recorder = LiveRecorder(sr=sr)
+    except ValueError as exc:
+        await websocket.close(code=1008, reason=str(exc))
+        return
+    await recorder.start()
+    await websocket.send_json({"type": "recording", "id": recorder.id})
     try:
         while True:
             data = await websocket.receive_bytes()
-            print(f"Received audio chunk: {len(data)} bytes")
+            recorder.append(data)
+    except WebSocketDisconnect:
+        pass
     except Exception as e:
         print(f"WebSocket error: {e}")
     finally:
-        await websocket.close()
-
-# =========================
-# Audio Transform Endpoint
-# =========================
-@app.post("/api/transform/upload")
-async def transform_audio(
-    file: UploadFile = File(...),
-    pitch_shift: int = Form(0),
-    time_stretch: float = Form(1.0),
-    clarity: bool = Form(False),
-    denoise: bool = Form(False),
-    style: str = Form(""),
-    autotune: bool = Form(False),
-):
-    tmp_path = None
-    try:
-        # 1️⃣ Save uploaded file to disk
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp:
-            tmp.write(await file.read())
-            tmp_path = tmp.name
-
-        # 2️⃣ Load + downsample to save memory
-        sound = AudioSegment.from_file(tmp_path, format="mp3")
-        sound = sound.set_channels(1).set_frame_rate(16000)
-
-        # 3️⃣ Pitch shift
-        if pitch_shift != 0:
-            sound = sound._spawn(
-                sound.raw_data,
-                overrides={"frame_rate": int(sound.frame_rate * (2.0 ** (pitch_shift / 12.0)))}
-            ).set_frame_rate(16000)
-
-        # 4️⃣ Time stretch (speed change)
-        if time_stretch != 1.0:
-            sound = sound._spawn(
-                sound.raw_data,
-                overrides={"frame_rate": int(sound.frame_rate * time_stretch)}
-            ).set_frame_rate(16000)
-
-        # TODO: clarity, denoise, autotune, style → add back later (memory heavy)
-
-        # 5️⃣ Export result
-        out_file = tmp_path.replace(".mp3", "_out.mp3")
-        sound.export(out_file, format="mp3")
-
-        # Free memory
-        del sound
-        gc.collect()
-
-        return FileResponse(out_file, filename="output.mp3", media_type="audio/mpeg")
-
-    except Exception as e:
-        return JSONResponse(content={"error": str(e)}, status_code=500)
-
-    finally:
-        if tmp_path and os.path.exists(tmp_path):
-            os.remove(tmp_path)
+        path = await recorder.finalize()
+        print(f"Live recording saved: {path}")
+        if websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.close()
@@ -7,9 +7,11 @@ import numpy as np
 import tempfile
 import os
 
+from audio_engine.resample import load_audio
+
 def deep_denoise(input_path: str) -> str:
     print("[Deep Denoise] Loading and processing audio")
-    y, sr = librosa.load(input_path, sr=16000)
+    y, sr = load_audio(input_path)
 
     # Estimate noise from first 0.5 seconds
     noise_sample = y[:sr // 2]
@@ -0,0 +1,164 @@
+# models/feature_extraction.py
+"""
+Compact per-upload feature vector, computed once at ingest.
+
+extract_features() reads everything from an AnalysisContext, so the STFT
+and f0 track it needs are the same ones the first pipeline stages reuse.
+It works on a single clip or a zero-padded stack of clips (pass the real
+lengths so padding is ignored).
+
+Backfill existing uploads:
+    python -m models.feature_extraction data/raw --update-db
+"""
+
+import argparse
+import json
+import os
+import re
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import librosa
+
+from audio_engine.analysis import AnalysisContext, HOP_LENGTH
+from audio_engine.resample import load_audio
+
+FEATURE_NAMES = (
+    "duration",
+    "rms_db",
+    "peak_db",
+    "noise_floor_db",
+    "voiced_ratio",
+    "f0_mean",
+    "f0_std",
+    "spectral_centroid",
+)
+AUDIO_EXTS = {".wav", ".mp3", ".flac", ".ogg", ".m4a", ".aac", ".webm"}
+EPS = 1e-10
+
+
+def _db(x):
+    return 20.0 * np.log10(np.maximum(x, EPS))
+
+
+def extract_features(ctx: AnalysisContext, lengths=None):
+    """
+    One pass over the cached analyses of `ctx`.
+    Returns a dict for a single clip, or a list of dicts for a (clips, n) stack.
+    """
+    y = np.atleast_2d(ctx.y)
+    n_clips, n = y.shape
+    lengths = np.full(n_clips, n) if lengths is None else np.asarray(lengths)
+
+    rms = np.atleast_2d(ctx.frame_energy())                               # (clips, frames)
+    centroid = np.atleast_2d(librosa.feature.spectral_centroid(S=ctx.magnitude(), sr=ctx.sr)[..., 0, :])
+    f0, voiced, _ = (np.atleast_2d(a) for a in ctx.f0())
+
+    frames = min(rms.shape[-1], f0.shape[-1])
+    valid = np.arange(frames)[None, :] < (1 + lengths[:, None] // HOP_LENGTH)
+    rms, centroid, f0, voiced = rms[:, :frames], centroid[:, :frames], f0[:, :frames], voiced[:, :frames]
+
+    samples = np.arange(n)[None, :] < lengths[:, None]
+    power = np.where(samples, y ** 2, 0.0).sum(axis=-1) / np.maximum(lengths, 1)
+    peak = np.where(samples, np.abs(y), 0.0).max(axis=-1)
+
+    voiced = voiced & valid
+    n_valid = np.maximum(valid.sum(axis=-1), 1)
+    f0_voiced = np.where(voiced, f0, np.nan)
+    weights = np.where(valid, rms, 0.0)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN rows = fully unvoiced clips
+        feats = {
+            "duration": lengths / ctx.sr,
+            "rms_db": 10.0 * np.log10(np.maximum(power, EPS)),
+            "peak_db": _db(peak),
+            "noise_floor_db": _db(np.nanpercentile(np.where(valid, rms, np.nan), 10, axis=-1)),
+            "voiced_ratio": voiced.sum(axis=-1) / n_valid,
+            "f0_mean": np.nan_to_num(np.nanmean(f0_voiced, axis=-1)),
+            "f0_std": np.nan_to_num(np.nanstd(f0_voiced, axis=-1)),
+            # energy-weighted, so silent frames do not drag the centroid around
+            "spectral_centroid": (centroid * weights).sum(axis=-1) / np.maximum(weights.sum(axis=-1), EPS),
+        }
+
+    rows = [{k: round(float(feats[k][i]), 4) for k in FEATURE_NAMES} for i in range(n_clips)]
+    return rows[0] if ctx.y.ndim == 1 else rows
+
+
+def features_to_vector(features: dict) -> np.ndarray:
+    """Fixed-order float32 vector (FEATURE_NAMES) for models / similarity search."""
+    return np.array([features[k] for k in FEATURE_NAMES], dtype=np.float32)
+
+
+def vector_to_features(vector) -> dict:
+    return {k: round(float(v), 4) for k, v in zip(FEATURE_NAMES, vector)}
+
+
+def extract_file(path: str) -> dict:
+    y, sr = load_audio(path)
+    return extract_features(AnalysisContext(y, sr))
+
+
+def extract_directory(folder: str, workers: int | None = None) -> dict:
+    """Features for every audio file under `folder`, spread over a process pool."""
+    paths = sorted(str(p) for p in Path(folder).rglob("*") if p.suffix.lower() in AUDIO_EXTS)
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        for path, feats in zip(paths, pool.map(_safe_extract, paths)):
+            if feats is not None:
+                results[path] = feats
+    return results
+
+
+def _safe_extract(path: str):
+    try:
+        return extract_file(path)
+    except Exception as e:
+        print(f"[Features] Skipping {path}: {e}")
+        return None
+
+
+def _original_name(path: str) -> str:
+    """Undo save_upload_file's `_<8 hex>` suffix to match TransformationLog.file_name."""
+    p = Path(path)
+    return re.sub(r"_[0-9a-f]{8}$", "", p.stem) + p.suffix
+
+
+def backfill(folder: str, update_db: bool = False, out: str | None = None) -> dict:
+    results = extract_directory(folder)
+    print(f"[Features] Extracted {len(results)} files from {folder}")
+
+    if out:
+        with open(out, "w") as f:
+            for path, feats in results.items():
+                f.write(json.dumps({"path": path, **feats}) + "\n")
+
+    if update_db:
+        from database.session_logger import SessionLocal
+        from database.models import TransformationLog
+
+        by_name = {_original_name(p): feats for p, feats in results.items()}
+        db = SessionLocal()
+        try:
+            rows = db.query(TransformationLog).filter(TransformationLog.features.is_(None)).all()
+            updated = 0
+            for row in rows:
+                if row.file_name in by_name:
+                    row.features = json.dumps(by_name[row.file_name])
+                    updated += 1
+            db.commit()
+            print(f"[Features] Backfilled {updated} log rows")
+        finally:
+            db.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch feature extraction / backfill")
+    parser.add_argument("folder", nargs="?", default="data/raw")
+    parser.add_argument("--update-db", action="store_true", help="fill TransformationLog.features")
+    parser.add_argument("--out", help="also write JSON lines to this file")
+    args = parser.parse_args()
+    backfill(args.folder, args.update_db, args.out)
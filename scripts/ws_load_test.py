@@ -0,0 +1,357 @@
+# scripts/ws_load_test.py
+"""
+Load generator and capacity report for the live /ws/audio path.
+
+Starts the app on a free local port (or targets --url), then ramps the
+number of concurrent sessions.  Every simulated client streams synthetic
+speech-like int16 frames at real-time pace over the seq protocol, with
+its own clarity / denoise / pitch / speed combination.  Per step the
+report holds round-trip latency percentiles, frames the server dropped,
+discarded as late or compressed, frames that never came back, sessions
+whose returned audio was silent, and the server's CPU and RSS.  A step
+passes when p95 round trip stays inside the frame period, nothing was
+shed and every session sounded; capacity is the last step passed before
+the first failure.  A short unreported warm-up compiles every chain
+first, so pool misses do not count against the ramp.
+
+    python -m scripts.ws_load_test --clients 1,2,4,8,16 --seconds 20 --out load_report.json
+    python -m scripts.ws_load_test --compare load_report.json --out load_report_new.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from urllib.parse import urlencode
+
+import numpy as np
+import websockets
+
+from api.live_protocol import pack_frame, parse_frame
+from config import CHUNK, RATE
+
+TAIL_SEQ = 0xFFFFFFFF           # encoder flush frame sent on close
+DRAIN_S = 1.0                   # wait this long past the jitter target for stragglers
+WARMUP_S = 2.0                  # unreported first step: compiles and pools every chain
+STARTUP_TIMEOUT_S = 60.0
+SILENT_PEAK = 33                # int16 (-60 dBFS): a session never louder than this came back silent
+
+# Cycled across clients so every step mixes cheap and expensive chains
+COMBOS = (
+    {},
+    {"clarity": "true"},
+    {"denoise": "true"},
+    {"pitch": 4},
+    {"speed": 1.25},
+    {"clarity": "true", "denoise": "true"},
+    {"pitch": -3, "speed": 0.9},
+    {"clarity": "true", "denoise": "true", "pitch": 5, "speed": 1.1},
+)
+
+# ────────────────────────────────────────────────────────
+# SYNTHETIC INPUT
+#
+# Gliding harmonic "vowels" with syllable-rate envelopes and pauses over a
+# low noise bed: voiced enough for pitch tracking, with real silences so
+# the VAD gate sees the same mix as a talking user.
+
+
+def synth_speech(seconds: float, sr: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sr)
+    t = np.arange(n) / sr
+
+    f0 = rng.uniform(100, 200) * (1 + 0.15 * np.sin(2 * np.pi * rng.uniform(0.2, 0.5) * t))
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    voice = sum(np.sin(k * phase) / k for k in range(1, 12))
+
+    syllables = np.clip(np.sin(2 * np.pi * rng.uniform(3, 5) * t), 0, None) ** 0.5
+    talking = np.repeat(rng.random(int(seconds) + 1) > 0.3, sr)[:n]     # ~30% of seconds are pauses
+    y = 0.25 * voice * syllables * talking + 0.003 * rng.standard_normal(n)
+    return (np.clip(y, -1, 1) * 32767).astype(np.int16)
+
+
+# ────────────────────────────────────────────────────────
+# SERVER
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    deadline = time.monotonic() + STARTUP_TIMEOUT_S
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server exited during startup (code {proc.returncode})")
+        try:
+            fetch_json(f"http://127.0.0.1:{port}/api/live/stats")
+            return proc
+        except OSError:
+            time.sleep(0.25)
+    proc.terminate()
+    raise RuntimeError("Server did not come up in time")
+
+
+def fetch_json(url: str):
+    with urllib.request.urlopen(url, timeout=5) as resp:
+        return json.load(resp)
+
+
+class ProcessSampler:
+    """CPU seconds and RSS of the server process, read from /proc (Linux only)."""
+
+    def __init__(self, pid: int | None):
+        self.pid = pid
+        self._tick = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        self._page = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def cpu_seconds(self) -> float | None:
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except (OSError, TypeError):
+            return None
+        return (int(fields[11]) + int(fields[12])) / self._tick    # utime + stime
+
+    def rss_mb(self) -> float | None:
+        try:
+            with open(f"/proc/{self.pid}/statm") as f:
+                return round(int(f.read().split()[1]) * self._page / 2 ** 20, 1)
+        except (OSError, TypeError):
+            return None
+
+
+# ────────────────────────────────────────────────────────
+# CLIENTS
+
+
+class Client:
+    def __init__(self, index: int, url: str, pcm: np.ndarray, frame_size: int, sr: int):
+        self.index = index
+        self.url = url
+        self.frames = [pcm[i:i + frame_size].tobytes() for i in range(0, len(pcm) - frame_size + 1, frame_size)]
+        self.period = frame_size / sr
+        self.rtt_ms = []
+        self.received = set()
+        self.sent = 0
+        self.peak = 0
+        self.error = None
+        self._last_rx = 0.0
+
+    async def run(self, start_delay: float, drain_s: float, drained: asyncio.Event, release: asyncio.Event):
+        try:
+            async with websockets.connect(self.url, max_size=None, open_timeout=STARTUP_TIMEOUT_S) as ws:
+                receiver = asyncio.create_task(self._receive(ws))
+                await asyncio.sleep(start_delay)
+                await self._send(ws)
+                await self._drain(drain_s)
+                drained.set()
+                await release.wait()     # stay connected until server stats are read
+                receiver.cancel()
+        except Exception as exc:
+            self.error = f"{type(exc).__name__}: {exc}"
+        finally:
+            drained.set()
+
+    async def _send(self, ws):
+        t0 = time.perf_counter()
+        for seq, payload in enumerate(self.frames):
+            delay = t0 + seq * self.period - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await ws.send(pack_frame(seq, time.perf_counter() * 1000.0, payload))
+            self.sent += 1
+        self._last_rx = max(self._last_rx, time.perf_counter())
+
+    async def _receive(self, ws):
+        async for message in ws:
+            if isinstance(message, str):
+                continue        # session report / periodic stats; totals come from /api/live/stats
+            seq, client_ts, payload = parse_frame(message)
+            now = time.perf_counter()
+            self._last_rx = now
+            if seq == TAIL_SEQ:
+                continue
+            self.received.add(seq)
+            self.peak = max(self.peak, int(np.abs(np.frombuffer(payload, np.int16).astype(np.int32)).max(initial=0)))
+            self.rtt_ms.append(now * 1000.0 - client_ts)
+
+    async def _drain(self, drain_s: float):
+        while len(self.received) < self.sent and time.perf_counter() - self._last_rx < drain_s:
+            await asyncio.sleep(0.05)
+
+
+async def run_step(base_url: str, n: int, args, sampler: ProcessSampler) -> dict:
+    frame_ms = 1000.0 * args.frame_size / args.sr
+    clients = []
+    for i in range(n):
+        params = {"protocol": "seq", "codec_out": "pcm", "sr": args.sr, "frame": args.frame_size,
+                  "latency_ms": args.latency_ms, "policy": args.policy, **COMBOS[i % len(COMBOS)]}
+        if args.vad is not None:
+            params["vad"] = args.vad
+        url = f"{base_url}/ws/audio?{urlencode(params)}"
+        clients.append(Client(i, url, synth_speech(args.seconds, args.sr, seed=i), args.frame_size, args.sr))
+
+    drained = [asyncio.Event() for _ in clients]
+    release = asyncio.Event()
+    # Spread start times over one frame period so clients do not send in lockstep
+    offsets = np.linspace(0, frame_ms / 1000.0, n, endpoint=False)
+    drain_s = args.latency_ms / 1000.0 + DRAIN_S
+
+    cpu0, t0 = sampler.cpu_seconds(), time.perf_counter()
+    tasks = [asyncio.create_task(c.run(o, drain_s, d, release)) for c, o, d in zip(clients, offsets, drained)]
+    await asyncio.gather(*(d.wait() for d in drained))
+    cpu1, wall = sampler.cpu_seconds(), time.perf_counter() - t0
+    rss = sampler.rss_mb()
+    try:
+        sessions = await asyncio.to_thread(fetch_json, base_url.replace("ws", "http", 1) + "/api/live/stats")
+    except OSError:
+        sessions = []
+    release.set()
+    await asyncio.gather(*tasks)
+
+    rtt = np.array(list(itertools.chain.from_iterable(c.rtt_ms for c in clients)))
+    sent = sum(c.sent for c in clients)
+    received = sum(len(c.received) for c in clients)
+    server = {key: sum(s[key] for s in sessions) for key in ("dropped", "late", "compressed", "gated")}
+    errors = [c.error for c in clients if c.error]
+    # Latency alone cannot tell a working chain from one that returns zeros
+    silent = [COMBOS[c.index % len(COMBOS)] for c in clients if c.received and c.peak < SILENT_PEAK]
+
+    step = {
+        "clients": n,
+        "frames_sent": sent,
+        "frames_received": received,
+        "lost": sent - received,
+        "rtt_ms": {p: round(float(np.percentile(rtt, q)), 2) if len(rtt) else None
+                   for p, q in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))},
+        "over_period": round(float(np.mean(rtt > frame_ms)), 4) if len(rtt) else None,
+        "server": server,
+        "cpu_percent": round(100.0 * (cpu1 - cpu0) / wall, 1) if cpu0 is not None and cpu1 is not None else None,
+        "rss_mb": rss,
+        "silent": silent,
+        "errors": errors,
+    }
+    step["passed"] = (not errors and not silent and len(rtt) > 0 and step["rtt_ms"]["p95"] <= frame_ms
+                      and step["lost"] == 0 and server["dropped"] == 0 and server["late"] == 0
+                      and server["compressed"] == 0)
+    return step
+
+
+# ────────────────────────────────────────────────────────
+# REPORT
+
+
+def git_version() -> str | None:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_step(step: dict, frame_ms: float):
+    r = step["rtt_ms"]
+    print(f"  N={step['clients']:>3}  p50={r['p50']}  p95={r['p95']}  p99={r['p99']} ms "
+          f"(period {frame_ms:.0f} ms)  lost={step['lost']}  dropped={step['server']['dropped']}  "
+          f"late={step['server']['late']}  cpu={step['cpu_percent']}%  "
+          f"{'PASS' if step['passed'] else 'FAIL'}")
+    for err in step["errors"][:3]:
+        print(f"      error: {err}")
+    for combo in step["silent"][:3]:
+        print(f"      silent output: {combo or 'no effects'}")
+
+
+def compare(old: dict, new: dict):
+    print(f"\nCompared with {old.get('version')} ({old.get('timestamp')}):")
+    print(f"  capacity: {old.get('capacity')} -> {new.get('capacity')} clients")
+    before = {s["clients"]: s for s in old.get("steps", [])}
+    for step in new["steps"]:
+        prev = before.get(step["clients"])
+        if not prev or prev["rtt_ms"]["p95"] is None or step["rtt_ms"]["p95"] is None:
+            continue
+        print(f"  N={step['clients']:>3}  p95 {prev['rtt_ms']['p95']} -> {step['rtt_ms']['p95']} ms  "
+              f"cpu {prev['cpu_percent']} -> {step['cpu_percent']}%")
+
+
+async def main(args) -> dict:
+    server = None
+    if args.url:
+        base_url, pid = args.url.rstrip("/"), args.server_pid
+    else:
+        port = free_port()
+        server = start_server(port)
+        base_url, pid = f"ws://127.0.0.1:{port}", server.pid
+    sampler = ProcessSampler(pid)
+    frame_ms = 1000.0 * args.frame_size / args.sr
+
+    report = {
+        "version": git_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": {"node": platform.node(), "cpus": os.cpu_count(), "python": platform.python_version()},
+        "config": {"frame_size": args.frame_size, "sr": args.sr, "frame_ms": round(frame_ms, 2),
+                   "seconds": args.seconds, "latency_ms": args.latency_ms, "policy": args.policy,
+                   "vad": args.vad, "combos": COMBOS},
+        "steps": [],
+        "capacity": 0,
+    }
+    print(f"Load test against {base_url}: {args.frame_size} samples @ {args.sr} Hz, {args.seconds:.0f} s per step")
+    try:
+        await run_step(base_url, len(COMBOS), argparse.Namespace(**{**vars(args), "seconds": WARMUP_S}), sampler)
+        failed = False
+        for n in args.clients:
+            step = await run_step(base_url, n, args, sampler)
+            report["steps"].append(step)
+            print_step(step, frame_ms)
+            failed = failed or not step["passed"]
+            if not failed:
+                report["capacity"] = n
+            elif not args.keep_going:
+                break
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+    print(f"Capacity: {report['capacity']} concurrent sessions")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for /ws/audio")
+    parser.add_argument("--clients", default="1,2,4,8,16,32",
+                        type=lambda s: [int(n) for n in s.split(",")], help="comma-separated ramp")
+    parser.add_argument("--seconds", type=float, default=20.0, help="audio streamed per client per step")
+    parser.add_argument("--frame-size", type=int, default=CHUNK, help="negotiated samples per frame")
+    parser.add_argument("--sr", type=int, default=RATE, help="client capture rate")
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="jitter buffer target")
+    parser.add_argument("--policy", choices=("drop", "compress"), default="drop")
+    parser.add_argument("--vad", choices=("true", "false"), help="override the server's VAD default")
+    parser.add_argument("--url", help="test a running server (ws://host:port) instead of starting one")
+    parser.add_argument("--server-pid", type=int, help="pid of the --url server, for CPU sampling")
+    parser.add_argument("--keep-going", action="store_true", help="continue the ramp after a failing step")
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--compare", help="previous report to diff against")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
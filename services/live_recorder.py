@@ -0,0 +1,134 @@
+# services/live_recorder.py
+
+import asyncio
+import os
+import uuid
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+from config import WORKING_SR, LIVE_RATES
+from services.file_handler import RAW_AUDIO_DIR
+
+RING_SECONDS = 30                 # max audio held in memory per session
+FLUSH_SECONDS = 2                 # write to disk in blocks of roughly this size
+
+
+def recording_path(recording_id: str) -> Path:
+    """Where a finalized live recording lives (next to normal uploads)."""
+    return RAW_AUDIO_DIR / f"live_{Path(recording_id).name}.wav"
+
+
+class RingBuffer:
+    """
+    Fixed-size int16 ring.  The socket side writes, the disk side reads;
+    capacity is allocated once so a session's memory never grows.
+    """
+
+    def __init__(self, capacity: int):
+        self._data = np.zeros(capacity, dtype=np.int16)
+        self._head = 0      # total samples ever written
+        self._tail = 0      # total samples ever consumed
+        self.overflowed = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self._data)
+
+    def __len__(self):
+        return self._head - self._tail
+
+    def write(self, samples: np.ndarray) -> int:
+        """Copy in as much as fits; anything beyond capacity is counted and dropped."""
+        n = min(len(samples), self.capacity - len(self))
+        self.overflowed += len(samples) - n
+        start = self._head % self.capacity
+        first = min(n, self.capacity - start)
+        self._data[start:start + first] = samples[:first]
+        self._data[:n - first] = samples[first:n]
+        self._head += n
+        return n
+
+    def peek(self) -> np.ndarray:
+        """Longest contiguous unread block (a view, no copy)."""
+        start = self._tail % self.capacity
+        return self._data[start:start + min(len(self), self.capacity - start)]
+
+    def consume(self, n: int):
+        self._tail += n
+
+
+class LiveRecorder:
+    """
+    Buffers incoming PCM in a RingBuffer and streams it to a WAV file from a
+    background task, so socket receives never wait on the disk.
+    """
+
+    def __init__(self, sr: int = WORKING_SR, channels: int = 1):
+        # The ring is sized from these, so only known rates are accepted
+        if sr not in LIVE_RATES:
+            raise ValueError(f"sr must be one of {list(LIVE_RATES)}, got {sr}")
+        if channels not in (1, 2):
+            raise ValueError(f"channels must be 1 or 2, got {channels}")
+        self.id = uuid.uuid4().hex[:12]
+        self.sr = sr
+        self.channels = channels
+        self.path = recording_path(self.id)
+        self._part = self.path.with_suffix(".part")
+        self._ring = RingBuffer(RING_SECONDS * sr * channels)
+        self._flush_at = FLUSH_SECONDS * sr * channels
+        self._carry = b""
+        self._file = None
+        self._wake = asyncio.Event()
+        self._closing = False
+        self._writer = None
+
+    @property
+    def dropped_samples(self) -> int:
+        return self._ring.overflowed
+
+    async def start(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = await asyncio.to_thread(
+            sf.SoundFile, str(self._part), "w", samplerate=self.sr,
+            channels=self.channels, format="WAV", subtype="PCM_16"
+        )
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def append(self, data: bytes):
+        """Non-blocking: copy into the ring and wake the writer once a block is ready."""
+        data = self._carry + data
+        usable = len(data) - len(data) % 2
+        self._carry = data[usable:]
+        self._ring.write(np.frombuffer(data[:usable], dtype=np.int16))
+        if len(self._ring) >= self._flush_at:
+            self._wake.set()
+
+    async def _write_loop(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            while len(self._ring) >= self._flush_at or (self._closing and len(self._ring)):
+                block = self._ring.peek()
+                frames = len(block) // self.channels * self.channels
+                if frames == 0:
+                    break
+                # Only the unread region is handed to the thread; append() never touches it
+                await asyncio.to_thread(self._file.write, block[:frames].reshape(-1, self.channels))
+                self._ring.consume(frames)
+            if self._closing:
+                return
+
+    async def finalize(self) -> Path:
+        """Drain the ring, close the WAV and publish it under its final name."""
+        self._closing = True
+        self._wake.set()
+        if self._writer is not None:
+            await self._writer
+        if self._file is not None:
+            await asyncio.to_thread(self._file.close)
+            os.replace(self._part, self.path)
+        if self.dropped_samples:
+            print(f"[LiveRecorder {self.id}] dropped {self.dropped_samples} samples (disk too slow)")
+        return self.path
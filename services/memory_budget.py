@@ -0,0 +1,263 @@
+# services/memory_budget.py
+
+import asyncio
+import os
+import resource
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+import soundfile as sf
+import librosa
+
+from config import WORKING_SR, MEMORY_BUDGET_MB, ADMISSION_QUEUE, ADMISSION_TIMEOUT_S
+
+# ────────────────────────────────────────────────────────
+# COST MODEL
+#   Peak bytes a step allocates on top of the signal: a fixed part plus a
+#   part per working-rate sample, fitted to tracemalloc peaks on 5-120 s
+#   clips with VAD off (the worst case; x1.5 headroom is applied).
+#   "features" is ingest extraction (STFT + pyin framing); its STFT and
+#   magnitude stay cached until the first stage changes the signal.
+#   pyin's cost is mostly fixed (~35-55 MB a call), so per-sample alone
+#   badly overstates long clips.
+STAGE_BYTES_PER_SAMPLE = {
+    "features": 100,
+    "time_stretch": 8,
+    "pitch": 8,
+    "clarity": 32,
+    "denoise": 16,
+    "autotune": 76,     # pyin again unless cached; rubberband round-trips through temp files
+    "style": 24,
+    "fun": 80,          # chipmunk/alien resample copies; delay-line taps are less
+}
+STAGE_FIXED_BYTES = {
+    "features": 56 * 1024 * 1024,
+    "autotune": 40 * 1024 * 1024,
+}
+FEATURE_CACHE_BYTES_PER_SAMPLE = 24
+SAFETY = 1.5
+FALLBACK_SR = 48000     # assumed source rate when a container cannot be probed
+SAMPLE_INTERVAL = 0.005
+
+MB = 1024 * 1024
+
+
+def estimate_bytes(duration: float, src_sr: int, stages: list[str], clips: int = 1,
+                   sr: int = WORKING_SR) -> int:
+    """
+    Peak memory of one transform: the source-rate decode plus resampled copy,
+    then the working signal with the largest single step on top of it.
+    Stages run one after another, so only the worst one counts.  List
+    "features" among `stages` when the request extracts them at ingest.
+    """
+    n_src = duration * src_sr * clips
+    n = duration * sr * clips
+    decode = n_src * 4 * 2
+    cache = FEATURE_CACHE_BYTES_PER_SAMPLE if "features" in stages else 0
+    work = max([0] + [STAGE_FIXED_BYTES.get(s, 0) * clips
+                      + n * (STAGE_BYTES_PER_SAMPLE.get(s, 0) + (0 if s == "features" else cache))
+                      for s in stages])
+    return int(SAFETY * max(decode, n * 4 + work))
+
+
+def probe(path: str) -> tuple[float, int]:
+    """(duration, sample rate) from the container header, without decoding."""
+    try:
+        info = sf.info(path)
+        return info.duration, info.samplerate
+    except Exception:
+        return librosa.get_duration(path=path), FALLBACK_SR
+
+
+def estimate_file(path: str, stages: list[str]) -> int:
+    duration, src_sr = probe(path)
+    return estimate_bytes(duration, src_sr, stages)
+
+
+# ────────────────────────────────────────────────────────
+# RSS MEASUREMENT
+
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE
+    except OSError:
+        # No procfs (macOS): fall back to the lifetime peak, reported in KiB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+class MemoryMeter:
+    """
+    Peak RSS per step of one request.  A sampler thread polls RSS while a
+    step runs, since the transient peak is usually freed before it returns.
+    RSS is per process, so overlapping requests show up in each other's numbers.
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = current_rss()
+        peak = [start]
+        stop = threading.Event()
+
+        def sample():
+            while not stop.wait(SAMPLE_INTERVAL):
+                peak[0] = max(peak[0], current_rss())
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            stop.set()
+            sampler.join()
+            peak[0] = max(peak[0], current_rss())
+            self.stages[name] = {
+                "peak_mb": round(peak[0] / MB, 1),
+                "delta_mb": round((peak[0] - start) / MB, 1),
+                "ms": round((time.perf_counter() - t0) * 1000.0, 1),
+            }
+
+    @property
+    def peak_delta(self) -> int:
+        return int(max((s["delta_mb"] for s in self.stages.values()), default=0) * MB)
+
+
+class MemoryStats:
+    """Process-wide per-stage peaks and estimate accuracy, for /api/memory."""
+
+    def __init__(self):
+        self.requests = 0
+        self.stages = {}
+        self.last = None
+        self._lock = threading.Lock()
+
+    def record(self, meter: MemoryMeter, estimated: int):
+        with self._lock:
+            self.requests += 1
+            for name, s in meter.stages.items():
+                agg = self.stages.setdefault(name, {"calls": 0, "max_delta_mb": 0.0, "total_delta_mb": 0.0})
+                agg["calls"] += 1
+                agg["max_delta_mb"] = max(agg["max_delta_mb"], s["delta_mb"])
+                agg["total_delta_mb"] += s["delta_mb"]
+            self.last = {
+                "estimated_mb": round(estimated / MB, 1),
+                "observed_mb": round(meter.peak_delta / MB, 1),
+                "stages": meter.stages,
+            }
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "rss_mb": round(current_rss() / MB, 1),
+                "stages": {
+                    name: {
+                        "calls": s["calls"],
+                        "max_delta_mb": s["max_delta_mb"],
+                        "avg_delta_mb": round(s["total_delta_mb"] / s["calls"], 1),
+                    }
+                    for name, s in self.stages.items()
+                },
+                "last_request": self.last,
+            }
+
+
+# ────────────────────────────────────────────────────────
+# ADMISSION CONTROL
+
+class MemoryBudgetExceeded(Exception):
+    """
+    retryable=False: the request can never be served (413).
+    retryable=True:  the queue is full or the wait timed out (503).
+    """
+
+    def __init__(self, message: str, retryable: bool):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class MemoryBudget:
+    """
+    Reserves estimated bytes against a fixed budget.  Requests that do not
+    fit right now wait in FIFO order, so a large upload is not starved by a
+    stream of small ones; the queue and the wait are both bounded.  A
+    request larger than the whole budget is not refused: it waits until
+    nothing else holds memory and then runs alone.
+    """
+
+    def __init__(self, limit_bytes: int, max_queue: int = ADMISSION_QUEUE,
+                 timeout: float = ADMISSION_TIMEOUT_S):
+        self.limit = limit_bytes
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.admitted = 0
+        self.queued_total = 0
+        self.rejected = 0
+        self.admitted_alone = 0
+        self._waiters = deque()
+        self._cond = asyncio.Condition()
+
+    @asynccontextmanager
+    async def reserve(self, nbytes: int):
+        def fits():
+            return self.in_use + nbytes <= self.limit or self.in_use == 0
+
+        async with self._cond:
+            if self._waiters or not fits():
+                if len(self._waiters) >= self.max_queue:
+                    self.rejected += 1
+                    raise MemoryBudgetExceeded("Server busy, admission queue is full", retryable=True)
+                token = object()
+                self._waiters.append(token)
+                self.queued_total += 1
+                try:
+                    await asyncio.wait_for(self._cond.wait_for(
+                        lambda: self._waiters[0] is token and fits()),
+                        self.timeout)
+                except asyncio.TimeoutError:
+                    self.rejected += 1
+                    raise MemoryBudgetExceeded("Server busy, timed out waiting for memory", retryable=True)
+                finally:
+                    self._waiters.remove(token)
+                    self._cond.notify_all()
+            if nbytes > self.limit:
+                self.admitted_alone += 1
+            self.in_use += nbytes
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self.admitted += 1
+
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self.in_use -= nbytes
+                self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        return {
+            "limit_mb": round(self.limit / MB, 1),
+            "in_use_mb": round(self.in_use / MB, 1),
+            "peak_in_use_mb": round(self.peak_in_use / MB, 1),
+            "queued": len(self._waiters),
+            "admitted": self.admitted,
+            "queued_total": self.queued_total,
+            "rejected": self.rejected,
+            "admitted_alone": self.admitted_alone,
+        }
+
+
+BUDGET = MemoryBudget(MEMORY_BUDGET_MB * MB)
+STATS = MemoryStats()
@@ -0,0 +1,85 @@
+# services/result_store.py
+
+import hashlib
+import json
+import mimetypes
+import os
+import re
+from pathlib import Path
+
+RESULTS_DIR = Path("data/results")
+KEYS_DIR = RESULTS_DIR / "keys"
+ID_LEN = 32                     # hex chars of the sha256 content digest
+READ_BLOCK = 1024 * 1024
+_ID_RE = re.compile(rf"^[0-9a-f]{{{ID_LEN}}}$")
+
+# ────────────────────────────────────────────────────────
+# CONTENT-ADDRESSED RESULTS
+#
+# A processed file is stored under the digest of its own bytes, so its ID
+# doubles as a strong ETag and never points at different content.  A
+# second index maps request key (input digest + parameters) -> result ID,
+# so retrying the same transform returns the stored file instead of
+# rendering it again.
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(READ_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def request_key(input_path: str, **params) -> str:
+    """Identity of a transform: what went in and how it was processed."""
+    spec = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(f"{file_digest(input_path)}:{spec}".encode()).hexdigest()
+
+
+def result_path(result_id: str) -> Path | None:
+    if not _ID_RE.match(result_id):
+        return None
+    matches = list(RESULTS_DIR.glob(f"{result_id}.*"))
+    return matches[0] if matches else None
+
+
+def lookup(key: str) -> str | None:
+    """Result ID previously stored for this request key, if its file still exists."""
+    try:
+        result_id = (KEYS_DIR / key).read_text().strip()
+    except OSError:
+        return None
+    return result_id if result_path(result_id) else None
+
+
+def put(path: str, key: str | None = None) -> str:
+    """Move a finished output into the store and return its ID."""
+    KEYS_DIR.mkdir(parents=True, exist_ok=True)
+    result_id = file_digest(path)[:ID_LEN]
+    target = RESULTS_DIR / f"{result_id}{Path(path).suffix}"
+    if target.exists():
+        os.remove(path)         # identical bytes already stored
+    else:
+        os.replace(path, target)
+    if key:
+        tmp = KEYS_DIR / f"{key}.tmp"
+        tmp.write_text(result_id)
+        os.replace(tmp, KEYS_DIR / key)
+    return result_id
+
+
+def etag(result_id: str) -> str:
+    return f'"{result_id}"'
+
+
+def media_type(path: Path) -> str:
+    return mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+
+
+def etag_matches(if_none_match: str, result_id: str) -> bool:
+    """If-None-Match uses weak comparison (RFC 9110 13.1.2)."""
+    if if_none_match.strip() == "*":
+        return True
+    tags = (t.strip().removeprefix("W/") for t in if_none_match.split(","))
+    return etag(result_id) in tags